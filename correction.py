@@ -0,0 +1,280 @@
+# correction.py
+import glob
+import json
+import os
+import numpy as np
+from scipy.fft import irfft, rfftfreq
+from scipy.signal import fftconvolve, firls
+from utils import interp_rows, log_frequency_grid, db_to_linear
+from instrumentation import profiler
+
+FIR_METHODS = ("frequency_sampling", "least_squares")
+Q_CANDIDATES = np.array([0.7, 1.4, 2.8, 5.6])
+
+
+def correction_target_db(freqs, normalized_db, f_low=50.0, f_high=16000.0, max_boost_db=6.0, max_cut_db=12.0,
+                         points_per_octave=24):
+    """
+    Inverse of the normalized (DUT - reference) curve on a log grid, limited to
+    [f_low, f_high] and to max_boost_db / max_cut_db. Outside the correction
+    range the target fades to 0 dB over one octave.
+    normalized_db may be 1D or (units, len(freqs)). Returns (grid, target_db).
+    """
+    grid = log_frequency_grid(max(freqs[1], 1.0), freqs[-1], points_per_octave)
+    normalized_log = interp_rows(grid, freqs, np.atleast_2d(normalized_db))
+    target = np.clip(-normalized_log, -max_cut_db, max_boost_db)
+
+    # Hold the edge values outside the range and fade them out over one octave
+    lo = min(np.searchsorted(grid, f_low), len(grid) - 1)
+    hi = max(np.searchsorted(grid, f_high, side="right") - 1, lo)
+    target[:, :lo] = target[:, [lo]]
+    target[:, hi + 1:] = target[:, [hi]]
+    octaves_out = np.maximum(np.log2(f_low / grid), 0) + np.maximum(np.log2(grid / f_high), 0)
+    fade = 0.5 * (1 + np.cos(np.pi * np.clip(octaves_out, 0, 1)))
+    return grid, target * fade
+
+
+def design_fir_batch(grid, target_db, fs=48000, numtaps=1023):
+    """
+    Linear-phase FIR by frequency sampling, designed for all units at once
+    with a single irfft over the (units, taps) matrix.
+    """
+    if numtaps % 2 == 0:
+        numtaps += 1
+    fir_freqs = rfftfreq(numtaps, 1 / fs)
+    log_fir = np.log(np.clip(fir_freqs, grid[0], grid[-1]))
+    magnitude = db_to_linear(interp_rows(log_fir, np.log(grid), np.atleast_2d(target_db)))
+    with profiler.stage("fir_design"):
+        h = irfft(magnitude, n=numtaps, axis=-1)
+        h = np.roll(h, numtaps // 2, axis=-1) * np.hanning(numtaps + 2)[1:-1]
+    return h
+
+
+def design_fir_least_squares(grid, target_db, fs=48000, numtaps=1023, bands_per_octave=6):
+    """
+    Linear-phase FIR by least-squares fit (scipy.signal.firls) of the target
+    on a coarser log grid. Designed per unit; returns (units, numtaps).
+    """
+    if numtaps % 2 == 0:
+        numtaps += 1
+    edges = np.concatenate(([0.0], log_frequency_grid(grid[0], grid[-1], bands_per_octave), [fs / 2]))
+    edges = np.unique(np.clip(edges, 0, fs / 2))
+    log_edges = np.log(np.clip(edges, grid[0], grid[-1]))
+    desired = db_to_linear(interp_rows(log_edges, np.log(grid), np.atleast_2d(target_db)))
+    bands = np.repeat(edges, 2)[1:-1]
+    with profiler.stage("fir_design"):
+        return np.array([firls(numtaps, bands, np.repeat(d, 2)[1:-1], fs=fs) for d in desired])
+
+
+def peaking_biquad(fc, gain_db, q, fs=48000):
+    """
+    RBJ cookbook peaking EQ. Arguments broadcast; returns b, a with a trailing
+    axis of 3 coefficients (a[..., 0] == 1).
+    """
+    A = 10 ** (np.asarray(gain_db) / 40)
+    w0 = 2 * np.pi * np.asarray(fc) / fs
+    alpha = np.sin(w0) / (2 * np.asarray(q))
+    cos_w0 = np.cos(w0)
+    a0 = 1 + alpha / A
+    b = np.stack(np.broadcast_arrays((1 + alpha * A) / a0, -2 * cos_w0 / a0, (1 - alpha * A) / a0), axis=-1)
+    a = np.stack(np.broadcast_arrays(np.ones_like(a0), -2 * cos_w0 / a0, (1 - alpha / A) / a0), axis=-1)
+    return b, a
+
+
+def biquad_response_db(b, a, freqs, fs=48000):
+    """
+    Magnitude response in dB of biquads b, a (shape (..., 3)) at freqs.
+    """
+    z = np.exp(-1j * 2 * np.pi * np.asarray(freqs) / fs)
+    num = b[..., 0, None] + b[..., 1, None] * z + b[..., 2, None] * z ** 2
+    den = a[..., 0, None] + a[..., 1, None] * z + a[..., 2, None] * z ** 2
+    return 20 * np.log10(np.maximum(np.abs(num / den), 1e-12))
+
+
+def design_parametric_eq(grid, target_db, fs=48000, num_biquads=8, f_low=50.0, f_high=16000.0, max_gain_db=12.0):
+    """
+    Greedy peaking-EQ fit for all units at once: each step places one biquad
+    at the largest remaining error, choosing Q from Q_CANDIDATES by residual RMS.
+    Returns dict of arrays shaped (units, num_biquads[, 3]).
+    """
+    target = np.atleast_2d(target_db)
+    units = target.shape[0]
+    in_range = (grid >= f_low) & (grid <= f_high)
+    eq_db = np.zeros_like(target)
+    fcs, gains, qs = (np.zeros((units, num_biquads)) for _ in range(3))
+    bs, as_ = np.zeros((units, num_biquads, 3)), np.zeros((units, num_biquads, 3))
+    rows = np.arange(units)
+
+    with profiler.stage("biquad_design"):
+        for k in range(num_biquads):
+            residual = np.where(in_range, target - eq_db, 0)
+            peak = np.argmax(np.abs(residual), axis=1)
+            fc = grid[peak]
+            gain = np.clip(residual[rows, peak], -max_gain_db, max_gain_db)
+            # Evaluate every Q candidate for every unit: (units, candidates, grid)
+            b, a = peaking_biquad(fc[:, None], gain[:, None], Q_CANDIDATES[None, :], fs)
+            trial = residual[:, None, :] - np.where(in_range, biquad_response_db(b, a, grid, fs), 0)
+            best = np.argmin(np.sqrt(np.mean(trial ** 2, axis=-1)), axis=1)
+            fcs[:, k], gains[:, k], qs[:, k] = fc, gain, Q_CANDIDATES[best]
+            bs[:, k], as_[:, k] = b[rows, best], a[rows, best]
+            eq_db += biquad_response_db(bs[:, k], as_[:, k], grid, fs)
+
+    return {"fc": fcs, "gain_db": gains, "q": qs, "b": bs, "a": as_, "response_db": eq_db}
+
+
+def write_fir_csv(path, fir, fs=48000):
+    with open(path, "w") as f:
+        f.write(f"FIR coefficient (fs={fs})\n")
+        for c in fir:
+            f.write(f"{c:.10e}\n")
+    print(f"[✓] Saved FIR coefficients to {path}")
+
+
+def write_biquads_csv(path, fc, gain_db, q, b, a):
+    with open(path, "w") as f:
+        f.write("Fc (Hz);Gain (dB);Q;b0;b1;b2;a1;a2\n")
+        for i in range(len(fc)):
+            f.write(f"{fc[i]:.2f};{gain_db[i]:.2f};{q[i]:.2f};"
+                    f"{b[i, 0]:.10e};{b[i, 1]:.10e};{b[i, 2]:.10e};{a[i, 1]:.10e};{a[i, 2]:.10e}\n")
+    print(f"[✓] Saved biquads to {path}")
+
+
+def validate_correction(folder, fir, reference_db, sweep_path="test_signals/sweep.wav", fs=48000,
+                        f_low=50.0, f_high=16000.0, smoothing_bins=5):
+    """
+    Convolve the recorded takes with the FIR, re-run deconvolution and report
+    the residual deviation from the reference inside the correction range.
+    """
+    import soundfile as sf
+    from processor import deconvolve, compute_frequency_response
+    from signal_manifest import verify_take_excitation
+    from utils import smooth_response
+
+    sweep, _ = sf.read(sweep_path)
+    takes = sorted(glob.glob(os.path.join(folder, "mic_take_*.wav")))
+    verify_take_excitation(folder, takes, sweep_path)
+    delay = len(fir) // 2
+    responses = []
+    for take in takes:
+        recorded, _ = sf.read(take)
+        signal = recorded[:, 0] if recorded.ndim > 1 else recorded
+        corrected = fftconvolve(signal, fir)[delay:delay + len(signal)]
+        freqs, mag_db = compute_frequency_response(deconvolve(corrected, sweep), fs)
+        responses.append(mag_db)
+
+    residual = smooth_response(np.mean(responses, axis=0), window_bins=smoothing_bins) - reference_db
+    in_range = (freqs >= f_low) & (freqs <= f_high)
+    return {
+        "max_abs_residual_db": float(np.max(np.abs(residual[in_range]))),
+        "rms_residual_db": float(np.sqrt(np.mean(residual[in_range] ** 2))),
+    }
+
+
+def load_normalized(folder):
+    data = np.loadtxt(os.path.join(folder, "normalized.csv"), delimiter=";", skiprows=1, ndmin=2)
+    return data[:, 0], data[:, 1]
+
+
+def batch_design_corrections(output_root="output", fs=48000, f_low=50.0, f_high=16000.0, max_boost_db=6.0,
+                             max_cut_db=12.0, numtaps=1023, fir_method="frequency_sampling", num_biquads=8,
+                             validate=False):
+    """
+    Design correction filters for every stored result folder with a
+    normalized.csv, all units in one vectorized pass. Writes
+    correction_fir.csv, correction_biquads.csv and correction.json per unit.
+    """
+    if fir_method not in FIR_METHODS:
+        raise ValueError(f"Unknown FIR method '{fir_method}', expected one of {FIR_METHODS}")
+
+    folders = sorted(os.path.dirname(p) for p in glob.glob(os.path.join(output_root, "*", "normalized.csv")))
+    if not folders:
+        print(f"[!] No normalized.csv found under {output_root}/")
+        return []
+
+    freqs, first = load_normalized(folders[0])
+    if not freqs[1] < f_low < f_high <= min(fs / 2, freqs[-1]):
+        raise ValueError(f"Correction range {f_low:g}-{f_high:g} Hz must satisfy "
+                         f"{freqs[1]:g} Hz < f_low < f_high <= {min(fs / 2, freqs[-1]):g} Hz")
+    curves, units = [first], [folders[0]]
+    for folder in folders[1:]:
+        f, curve = load_normalized(folder)
+        if len(f) != len(freqs) or not np.allclose(f, freqs):
+            print(f"[⚠] Skipping {folder}: frequency grid differs from {folders[0]}")
+            continue
+        curves.append(curve)
+        units.append(folder)
+    curves = np.array(curves)
+    print(f"[🎛] Designing correction filters for {len(units)} unit(s)...")
+
+    grid, target = correction_target_db(freqs, curves, f_low, f_high, max_boost_db, max_cut_db)
+    if fir_method == "least_squares":
+        firs = design_fir_least_squares(grid, target, fs, numtaps)
+    else:
+        firs = design_fir_batch(grid, target, fs, numtaps)
+    eq = design_parametric_eq(grid, target, fs, num_biquads, f_low, f_high, max(max_boost_db, max_cut_db)) \
+        if num_biquads > 0 else None
+
+    reference_cache = {}
+    for i, folder in enumerate(units):
+        write_fir_csv(os.path.join(folder, "correction_fir.csv"), firs[i], fs)
+        summary = {
+            "fs": fs, "f_low": f_low, "f_high": f_high, "max_boost_db": max_boost_db, "max_cut_db": max_cut_db,
+            "numtaps": int(firs.shape[1]), "fir_method": fir_method, "num_biquads": num_biquads,
+        }
+        if eq is not None:
+            write_biquads_csv(os.path.join(folder, "correction_biquads.csv"),
+                              eq["fc"][i], eq["gain_db"][i], eq["q"][i], eq["b"][i], eq["a"][i])
+            in_range = (grid >= f_low) & (grid <= f_high)
+            summary["biquad_max_error_db"] = float(np.max(np.abs((target[i] - eq["response_db"][i])[in_range])))
+        if validate:
+            summary["validation"] = _validate_unit(folder, firs[i], fs, f_low, f_high, reference_cache)
+        with open(os.path.join(folder, "correction.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+    print(f"[✓] Correction filters written for {len(units)} unit(s)")
+    return units
+
+
+def _validate_unit(folder, fir, fs, f_low, f_high, reference_cache):
+    from processor import process_mic_recordings
+
+    meta_path = os.path.join(folder, "metadata.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        metadata = json.load(f)
+    ref_name = metadata.get("reference_mic")
+    rec_folder = os.path.join("recordings", metadata.get("mic_name", ""))
+    ref_folder = os.path.join("recordings", f"ref_{ref_name}")
+    if not ref_name or not os.path.isdir(rec_folder) or not os.path.isdir(ref_folder):
+        print(f"[⚠] Cannot validate {folder}: recordings not found")
+        return None
+    if ref_name not in reference_cache:
+        reference_cache[ref_name] = process_mic_recordings(ref_folder, fs=fs)[1]
+    result = validate_correction(rec_folder, fir, reference_cache[ref_name], fs=fs, f_low=f_low, f_high=f_high)
+    print(f"[✓] {folder}: residual max {result['max_abs_residual_db']:.2f} dB, rms {result['rms_residual_db']:.2f} dB")
+    return result
+
+
+def correction_settings(config):
+    """
+    Read [correction] settings from a ConfigParser as batch_design_corrections kwargs.
+    """
+    section = config["correction"] if "correction" in config else {}
+    get = section.get
+    return {
+        "f_low": float(get("f_low", "50")),
+        "f_high": float(get("f_high", "16000")),
+        "max_boost_db": float(get("max_boost_db", "6")),
+        "max_cut_db": float(get("max_cut_db", "12")),
+        "numtaps": int(get("numtaps", "1023")),
+        "fir_method": get("fir_method", "frequency_sampling"),
+        "num_biquads": int(get("num_biquads", "8")),
+    }
+
+
+if __name__ == "__main__":
+    import configparser
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+    batch_design_corrections(validate=True, **correction_settings(config))
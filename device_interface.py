@@ -1,6 +1,8 @@
 # device_interface.py
+import threading
 import sounddevice as sd
 import numpy as np
+from instrumentation import profiler
 
 
 def list_devices():
@@ -31,12 +33,14 @@ def get_device_info():
     return sd.query_devices(input_dev), sd.query_devices(output_dev)
 
 
-def list_devices_by_hostapi(hostapi_index, prompt="Select device:"):
+def list_devices_by_hostapi(hostapi_index, prompt="Select device:", devices=None):
     """
     Filter input/output devices if ASIO not found. Lists only valid choices.
+    Pass an already enumerated device list to avoid querying again.
     """
     print(f"[🎚] Listing {prompt.lower()} options...")
-    devices = sd.query_devices()
+    if devices is None:
+        devices = sd.query_devices()
     if "input" in prompt.lower():
         filtered = [(i, d) for i, d in enumerate(devices) if d["max_input_channels"] > 0]
     else:
@@ -76,3 +80,222 @@ def extract_mono_channel(stereo_input, channel_index):
     else:
         return stereo_input[:, [0]]  # fallback to first
 
+
+
+class DeviceSession:
+    """
+    Enumerate devices at most once per process, cache the devices in use by
+    host API and name in settings.ini and keep one duplex stream open across takes.
+    """
+
+    CACHE_PREFIX = "device:"
+    CHANNELS = 2  # the persistent stream is always 2 in / 2 out
+
+    def __init__(self, config=None, blocksize=1024):
+        self.config = config
+        self.blocksize = blocksize
+        self._hostapis = None
+        self._devices = None
+        self._info = {}
+        self._validated = set()
+        self._stream = None
+        self._stream_key = None
+        self._job = None
+        self._done = threading.Event()
+
+    @property
+    def hostapis(self):
+        if self._hostapis is None:
+            with profiler.stage("device_query"):
+                self._hostapis = sd.query_hostapis()
+        return self._hostapis
+
+    @property
+    def devices(self):
+        if self._devices is None:
+            with profiler.stage("device_query"):
+                self._devices = sd.query_devices()
+        return self._devices
+
+    def find_hostapi(self, keyword="ASIO"):
+        return next((i for i, api in enumerate(self.hostapis) if keyword in api['name'].upper()), None)
+
+    def _store_capabilities(self, index, info):
+        if self.config is None:
+            return
+        # One entry per index; the same name appears under several host APIs (MME, WASAPI...)
+        for section in self.config.sections():
+            if section.startswith(self.CACHE_PREFIX) and self.config[section].getint("index", -1) == index:
+                self.config.remove_section(section)
+        self.config[f"{self.CACHE_PREFIX}{info['hostapi']}:{info['name']}"] = {
+            "index": str(index),
+            "max_input_channels": str(info['max_input_channels']),
+            "max_output_channels": str(info['max_output_channels']),
+        }
+
+    def _cached_capabilities(self, index):
+        if self.config is None:
+            return None
+        for section in self.config.sections():
+            if section.startswith(self.CACHE_PREFIX) and self.config[section].getint("index", -1) == index:
+                hostapi, _, name = section[len(self.CACHE_PREFIX):].partition(":")
+                entry = self.config[section]
+                if not hostapi.isdigit() or "max_input_channels" not in entry:
+                    continue  # entry from an older version
+                return {
+                    "name": name,
+                    "hostapi": int(hostapi),
+                    "max_input_channels": entry.getint("max_input_channels"),
+                    "max_output_channels": entry.getint("max_output_channels"),
+                }
+        return None
+
+    def device_info(self, index):
+        """
+        Return name, host API and channel counts for a device index. A
+        settings.ini entry is only trusted after PortAudio confirms the same
+        name and host API at that index (single-device query); otherwise
+        devices are enumerated once. Raises if the index does not exist.
+        """
+        if index not in self._info:
+            info = None if self._devices is not None else self._cached_capabilities(index)
+            if info is not None:
+                with profiler.stage("device_query"):
+                    actual = sd.query_devices(index)
+                if actual['name'] != info['name'] or actual['hostapi'] != info['hostapi']:
+                    print(f"[⚠] Device #{index} is now '{actual['name']}', refreshing device cache")
+                    info = None
+            if info is None:
+                dev = self.devices[index]
+                info = {key: dev[key] for key in ("name", "hostapi", "max_input_channels", "max_output_channels")}
+                self._store_capabilities(index, info)
+            self._info[index] = info
+        return self._info[index]
+
+    def resolve_device(self, index, name=None, hostapi=None):
+        """
+        Return the current index of a saved device. If the saved index now
+        points at a different device, look the name up on the saved host API
+        (or the one cached for that index) in one enumeration.
+        Raises LookupError if it is gone.
+        """
+        if hostapi is None and name is not None:
+            cached = self._cached_capabilities(index)
+            if cached is not None and cached['name'] == name:
+                hostapi = cached['hostapi']
+        try:
+            info = self.device_info(index)
+            if name is None or (info['name'] == name and hostapi in (None, info['hostapi'])):
+                return index
+        except (sd.PortAudioError, ValueError, IndexError):
+            if name is None:
+                raise LookupError(f"Device #{index} not found")
+        matches = [i for i, dev in enumerate(self.devices)
+                   if dev['name'] == name and hostapi in (None, dev['hostapi'])]
+        if not matches:
+            where = f" on host API #{hostapi}" if hostapi is not None else ""
+            raise LookupError(f"Device '{name}' not found{where}")
+        print(f"[ℹ] Device '{name}' moved from #{index} to #{matches[0]}")
+        return matches[0]
+
+    def invalidate(self):
+        """
+        Forget cached capabilities (e.g. after a device was replugged).
+        """
+        self._devices = None
+        self._info = {}
+        self._validated = set()
+
+    def validate_pair(self, input_device, output_device):
+        if (input_device, output_device) in self._validated:
+            return
+        in_info = self.device_info(input_device)
+        out_info = self.device_info(output_device)
+        if in_info['hostapi'] != out_info['hostapi']:
+            raise ValueError(f"Incompatible devices: input '{in_info['name']}' and output '{out_info['name']}' use different host APIs.")
+        if in_info['max_input_channels'] < self.CHANNELS:
+            raise ValueError(f"Input device '{in_info['name']}' has {in_info['max_input_channels']} input channel(s), "
+                             f"{self.CHANNELS} required.")
+        if out_info['max_output_channels'] < self.CHANNELS:
+            raise ValueError(f"Output device '{out_info['name']}' has {out_info['max_output_channels']} output channel(s), "
+                             f"{self.CHANNELS} required.")
+        self._validated.add((input_device, output_device))
+
+    def _callback(self, indata, outdata, frames, time, status):
+        if status:
+            print("[!] Stream warning:", status)
+            profiler.count_stream_status(status)
+
+        job = self._job
+        if job is None:
+            outdata[:, :] = 0
+            return
+
+        playback, recording = job["playback"], job["recording"]
+        start = job["cursor"]
+        end = start + frames
+        remaining = len(playback) - start
+
+        if remaining >= frames:
+            outdata[:frames, :] = playback[start:end]
+        elif remaining > 0:
+            outdata[:remaining, :] = playback[start:]
+            outdata[remaining:, :] = 0
+        else:
+            outdata[:, :] = 0
+
+        if end <= len(recording):
+            recording[start:end, :] = indata[:frames, :]
+        else:
+            available = len(recording) - start
+            if available > 0:
+                recording[start:, :] = indata[:available, :]
+
+        job["cursor"] = end
+        if end >= len(playback):
+            self._job = None
+            self._done.set()
+
+    def _ensure_stream(self, fs, input_device, output_device):
+        key = (fs, input_device, output_device, self.blocksize)
+        if self._stream is not None and self._stream_key == key and self._stream.active:
+            return
+        self.close()
+        try:
+            with profiler.stage("stream_open"):
+                self._stream = sd.Stream(samplerate=fs,
+                                         blocksize=self.blocksize,
+                                         dtype='float32',
+                                         channels=(self.CHANNELS, self.CHANNELS),  # 2 in, 2 out (stereo)
+                                         device=(input_device, output_device),
+                                         callback=self._callback)
+                self._stream.start()
+        except Exception:
+            self._stream = None
+            self.invalidate()  # device indices may have changed since caching
+            raise
+        self._stream_key = key
+        print(f"[🎧] Opened persistent stream ({fs} Hz, devices {input_device}/{output_device})")
+
+    def play_record(self, stereo_buffer, fs, input_device, output_device):
+        """
+        Play a stereo buffer and record 2 input channels of the same length
+        on the persistent stream. Returns the (N, 2) float32 recording.
+        """
+        self.validate_pair(input_device, output_device)
+        self._ensure_stream(fs, input_device, output_device)
+        recording = np.zeros((len(stereo_buffer), self.CHANNELS), dtype=np.float32)
+        self._done.clear()
+        with profiler.stage("playback"):
+            self._job = {"playback": stereo_buffer, "recording": recording, "cursor": 0}
+            while not self._done.wait(0.05):
+                if not self._stream.active:
+                    self._job = None
+                    raise RuntimeError("Audio stream stopped during playback")
+        return recording
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+            self._stream_key = None
@@ -0,0 +1,55 @@
+# exporter.py
+import json
+import numpy as np
+from instrumentation import profiler
+
+
+def write_response_csv(path, freqs, smoothed, std):
+    """
+    Save smoothed response and std deviation as semicolon separated CSV.
+    """
+    with profiler.stage("csv_export"), open(path, "w") as f:
+        f.write("Frequency (Hz);Smoothed Response (dB);Std Dev (dB)\n")
+        for f_hz, db_val, std_val in zip(freqs, smoothed, std):
+            f.write(f"{f_hz:.2f};{db_val:.2f};{std_val:.2f}\n")
+    print(f"[✓] Saved response CSV to {path}")
+
+
+def write_normalized_csv(path, freqs, normalized):
+    """
+    Save normalized (DUT - reference) response as semicolon separated CSV.
+    """
+    with profiler.stage("csv_export"), open(path, "w") as f:
+        f.write("Frequency (Hz);Normalized Response (dB)\n")
+        for f_hz, db_val in zip(freqs, normalized):
+            f.write(f"{f_hz:.2f};{db_val:.2f}\n")
+    print(f"[✓] Saved normalized CSV to {path}")
+
+
+def write_metadata(path, metadata):
+    with open(path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    print(f"[✓] Saved metadata to {path}")
+
+
+def append_run_history(timestamp, name, ref_name, out_folder, version="v0.9-beta", log_path="run_history.log"):
+    with open(log_path, "a") as log:
+        log.write(f"{timestamp} | Test: {name} | Reference: {ref_name} | Output: {out_folder} | Version: {version}\n")
+
+
+def write_spectra(path, spectra):
+    """
+    Save complex spectra, phase and group delay (from process_mic_recordings
+    with return_spectra=True) as a compressed .npz next to the CSVs.
+    """
+    with profiler.stage("spectra_export"):
+        np.savez_compressed(path, **spectra)
+    print(f"[✓] Saved spectra to {path}")
+
+
+def load_spectra(path):
+    """
+    Load a spectra .npz written by write_spectra into a dict of arrays.
+    """
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
@@ -0,0 +1,167 @@
+# instrumentation.py
+import glob
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_NAME = "profile.json"
+STARTUP_FOLDER = "profiles"
+
+# Stream callback status flags counted as xruns
+XRUN_FLAGS = ("input_underflow", "input_overflow", "output_underflow", "output_overflow")
+
+
+class RunProfiler:
+    """
+    Collects per-stage timings, event counters and peak memory for one run.
+    Safe to update from the audio callback thread.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.started = time.time()
+        if self.enabled:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                s = self.stages.setdefault(name, {"count": 0, "total_s": 0.0, "min_s": elapsed, "max_s": elapsed})
+                s["count"] += 1
+                s["total_s"] += elapsed
+                s["min_s"] = min(s["min_s"], elapsed)
+                s["max_s"] = max(s["max_s"], elapsed)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def count_stream_status(self, status):
+        """
+        Count a non-empty sounddevice callback status and its xrun flags.
+        """
+        if not self.enabled or not status:
+            return
+        self.count("stream_status")
+        for flag in XRUN_FLAGS:
+            if getattr(status, flag, False):
+                self.count(flag)
+                self.count("xruns")
+
+    def to_dict(self):
+        with self._lock:
+            data = {
+                "started": time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started)),
+                "wall_time_s": time.time() - self.started,
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+        data["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        return data
+
+    def write(self, folder, extra=None, filename=PROFILE_NAME):
+        """
+        Write the profile as profile.json into folder (next to metadata.json).
+        """
+        if not self.enabled:
+            return None
+        data = self.to_dict()
+        if extra:
+            data.update(extra)
+        path = os.path.join(folder, filename)
+        os.makedirs(folder, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"[✓] Saved profile to {path}")
+        return path
+
+
+profiler = RunProfiler(enabled=False)
+
+
+def enable_profiling(enabled=True):
+    profiler.enabled = enabled
+    profiler.reset()
+
+
+def write_startup_profile():
+    """
+    Write the session startup timings (host API / device enumeration) to
+    profiles/startup_<timestamp>.json before the first menu action resets them.
+    """
+    timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(profiler.started))
+    return profiler.write(STARTUP_FOLDER, extra={"action": "startup"}, filename=f"startup_{timestamp}.json")
+
+
+def aggregate_profiles(patterns=("output/*/profile.json", "recordings/*/profile.json", f"{STARTUP_FOLDER}/*.json"),
+                       save_path=None):
+    """
+    Aggregate stage timings and counters over many profile.json files.
+    Returns a dict with per-stage totals/means and summed counters.
+    """
+    files = sorted(set(p for pattern in patterns for p in glob.glob(pattern)))
+    stages = {}
+    counters = {}
+    peak = 0
+    for path in files:
+        with open(path) as f:
+            data = json.load(f)
+        for name, s in data.get("stages", {}).items():
+            agg = stages.setdefault(name, {"runs": 0, "count": 0, "total_s": 0.0, "min_s": s["min_s"], "max_s": s["max_s"]})
+            agg["runs"] += 1
+            agg["count"] += s["count"]
+            agg["total_s"] += s["total_s"]
+            agg["min_s"] = min(agg["min_s"], s["min_s"])
+            agg["max_s"] = max(agg["max_s"], s["max_s"])
+        for name, value in data.get("counters", {}).items():
+            counters[name] = counters.get(name, 0) + value
+        peak = max(peak, data.get("peak_memory_bytes") or 0)
+
+    for agg in stages.values():
+        agg["mean_s"] = agg["total_s"] / agg["count"] if agg["count"] else 0.0
+
+    report = {"runs": len(files), "stages": stages, "counters": counters, "peak_memory_bytes": peak}
+    if save_path:
+        with open(save_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[✓] Saved profile report to {save_path}")
+    return report
+
+
+def print_profile_report(report):
+    print(f"\n[⏱] Profile report over {report['runs']} runs")
+    print(f"{'Stage':<20}{'Count':>8}{'Total (s)':>12}{'Mean (s)':>12}{'Max (s)':>12}")
+    for name, s in sorted(report["stages"].items(), key=lambda kv: -kv[1]["total_s"]):
+        print(f"{name:<20}{s['count']:>8}{s['total_s']:>12.3f}{s['mean_s']:>12.4f}{s['max_s']:>12.4f}")
+    for name, value in sorted(report["counters"].items()):
+        print(f"[#] {name}: {value}")
+    print(f"[#] peak memory: {report['peak_memory_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    os.makedirs("output", exist_ok=True)
+    report = aggregate_profiles(save_path=os.path.join("output", "profile_report.json"))
+    print_profile_report(report)
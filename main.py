@@ -6,41 +6,79 @@ import keyboard
 from datetime import datetime
 import json
 import configparser
-import sounddevice as sd
-from sweep_generator import generate_log_sweep, generate_white_noise, generate_pink_noise, generate_silence
-from recorder import record_mic_response, record_noise_samples
+from signal_manifest import ensure_test_signals, load_manifest
 from processor import process_mic_recordings, detect_anomalies
 from plotter import plot_frequency_response
-from device_interface import list_devices_by_hostapi
-
-def get_saved_or_prompt_device(key, prompt, config, asio_index):
+from station import run_station
+from correction import batch_design_corrections, correction_settings
+from matching import match_inventory, matching_settings
+from polar import TURNTABLES, angle_set, record_polar_session, process_polar_session
+from exporter import write_response_csv, write_normalized_csv, write_metadata, append_run_history, write_spectra
+from instrumentation import profiler, enable_profiling, aggregate_profiles, print_profile_report, write_startup_profile
+
+# sounddevice (and recorder/device_interface, which import it) is imported inside
+# the functions below: station workers are spawned on Windows and re-import this
+# module, and must not initialize PortAudio while the parent holds the stream.
+
+def get_saved_or_prompt_device(key, prompt, config, asio_index, session=None):
+    import sounddevice as sd
+    from device_interface import list_devices_by_hostapi
+
+    name_key = f"{key}_name"
+    hostapi_key = f"{key}_hostapi"
     try:
         saved = int(config["audio"].get(key, ""))
-        name = sd.query_devices(saved)["name"]
+        if session is not None:
+            saved_hostapi = config["audio"].get(hostapi_key, "")
+            saved = session.resolve_device(saved, config["audio"].get(name_key) or None,
+                                           int(saved_hostapi) if saved_hostapi else None)
+            info = session.device_info(saved)
+        else:
+            with profiler.stage("device_query"):
+                info = sd.query_devices(saved)
+        name = info["name"]
         print(f"[ℹ] Using saved {prompt.lower()} ({saved}): {name}")
-        return saved
     except:
         print(f"[?] Listing devices from host API #{asio_index}...")
-        idx = list_devices_by_hostapi(asio_index, prompt=prompt)
-        config["audio"][key] = str(idx)
-        return idx
+        devices = session.devices if session is not None else sd.query_devices()
+        while True:
+            saved = list_devices_by_hostapi(asio_index, prompt=prompt, devices=devices)
+            if 0 <= saved < len(devices):
+                break
+            print("[!] Invalid device index.")
+        info = devices[saved]
+    config["audio"][key] = str(saved)
+    config["audio"][name_key] = info["name"].replace("%", "%%")  # escape configparser interpolation
+    config["audio"][hostapi_key] = str(info["hostapi"])
+    return saved
 
 # MAIN MENU
-def menu():
+def menu(profile=False):
+    import sounddevice as sd
+    from device_interface import DeviceSession
+
     config_path = "settings.ini"
     config = configparser.ConfigParser()
     config.read(config_path)
     if "processor" not in config:
         config["processor"] = {}
+    if "profiling" not in config:
+        config["profiling"] = {}
+    profile_enabled = profile or config["profiling"].getboolean("enabled", fallback=False)
+    enable_profiling(profile_enabled)
+    if profile_enabled:
+        print("[⏱] Profiling enabled")
     anomaly_threshold_db = float(config["processor"].get("anomaly_threshold_db", "6"))
+    min_phase = config["processor"].getboolean("minimum_phase", fallback=True)
     n = None  # default sweep count for metadata
 
     if "audio" not in config:
         config["audio"] = {}
     
 
-    hostapis = sd.query_hostapis()
-    asio_index = next((i for i, api in enumerate(hostapis) if "ASIO" in api['name'].upper()), None)
+    session = DeviceSession(config)
+    hostapis = session.hostapis
+    asio_index = session.find_hostapi("ASIO")
 
     if asio_index is not None:
         print(f"[🎧] Using ASIO backend: {hostapis[asio_index]['name']}")
@@ -49,181 +87,253 @@ def menu():
     else:
         print("[⚠] ASIO backend not found. Using system default.")
         config["audio"]["backend"] = "WASAPI"
+    write_startup_profile()
 
-    while True:
-        choice = input(f" \
+    try:
+        while True:
+            choice = input(f" \
             🎤 Mic Measurement System\n \
             1. Record new mic\n \
             2. Record reference mic\n \
             3. Generate test signals\n \
             4. Process and plot mic response\n \
-            5. Exit\n \
+            5. Station mode (pipelined capture/processing)\n \
+            6. Generate correction filters\n \
+            7. Match mic pairs/sets\n \
+            8. Polar measurement session\n \
+            9. Exit\n \
             Select option: ")        
-
-        if choice == "1":
-            if not os.path.exists("test_signals/sweep.wav"):
-                print("[!] Sweep file missing. Please generate test signals first.")
-                continue
-            name = input("Enter mic name: ").strip()
-            record_mic(name, is_reference=False, config=config, asio_index=asio_index, anomaly_threshold_db=anomaly_threshold_db)
+            profiler.reset()
+
+            if choice == "1":
+                ensure_test_signals("test_signals")
+                name = input("Enter mic name: ").strip()
+                record_mic(name, is_reference=False, config=config, asio_index=asio_index, anomaly_threshold_db=anomaly_threshold_db,
+                           session=session)
+                profiler.write(os.path.join("recordings", name), extra={"mic_name": name, "action": "record"})
         
-        elif choice == "2":
-            if not os.path.exists("test_signals/sweep.wav"):
-                print("[!] Sweep file missing. Please generate test signals first.")
-                continue
-            name = input("Enter mic name: ").strip()
-            record_mic(name, is_reference=True, config=config, asio_index=asio_index, anomaly_threshold_db=anomaly_threshold_db)
+            elif choice == "2":
+                ensure_test_signals("test_signals")
+                name = input("Enter mic name: ").strip()
+                record_mic(name, is_reference=True, config=config, asio_index=asio_index, anomaly_threshold_db=anomaly_threshold_db,
+                           session=session)
+                profiler.write(os.path.join("recordings", f"ref_{name}"), extra={"mic_name": name, "action": "record_reference"})
 
           
-        elif choice == "3":
-            os.makedirs("test_signals", exist_ok=True)
-            generate_log_sweep("test_signals/sweep.wav")
-            generate_white_noise("test_signals/white_noise.wav")
-            generate_pink_noise("test_signals/pink_noise.wav")
-            generate_silence("test_signals/silence.wav")
-
-            # Also record 5s of white and pink noise for future use
-            from time import sleep
-            import soundfile as sf
-            import numpy as np
-
-            print("[🎙] Recording white noise (5s)...")
-            white, _ = sf.read("test_signals/white_noise.wav")
-            white = white[:240000]  # 5s at 48kHz
-            sf.write("test_signals/white_recorded.wav", white, 48000)
-
-            print("[🎙] Recording pink noise (5s)...")
-            pink, _ = sf.read("test_signals/pink_noise.wav")
-            pink = pink[:240000]  # 5s at 48kHz
-            sf.write("test_signals/pink_recorded.wav", pink, 48000)
-
-        elif choice == "4":
-            # List available mic recordings
-            all_mics = sorted([d for d in os.listdir("recordings") if os.path.isdir(os.path.join("recordings", d))])
-            print("Available mic recordings:")
-            for i, mic in enumerate(all_mics, 1):
-                print(f"{i}. {mic}")
-
-            # Auto-suggest last used mic names from config
-            last_test = config.get("audio", "last_test_mic", fallback="")
-            last_ref = config.get("audio", "last_ref_mic", fallback="")
-
-            name_input = input(f"Enter test mic name to process (number or name) [default: {last_test}]: ").strip()
-            if name_input.isdigit() and 1 <= int(name_input) <= len(all_mics):
-                name = all_mics[int(name_input)-1]
-            else:
-                name = name_input or last_test
-            test_path = os.path.join("recordings", name)
-            if not os.path.exists(test_path):
-                print("[!] Test mic folder not found.")
-                continue
-
-            ref_input = input(f"Enter reference mic name (number or name) [default: {last_ref}]: ").strip()
-            if ref_input.isdigit() and 1 <= int(ref_input) <= len(all_mics):
-                ref_name = all_mics[int(ref_input)-1]
-            else:
-                ref_name = ref_input or last_ref
-            ref_db = None
-            if ref_name:
-                ref_path = os.path.join("recordings", f"ref_{ref_name}")
-                if not os.path.exists(ref_path):
-                    print("[!] Reference mic folder not found.")
+            elif choice == "3":
+                ensure_test_signals("test_signals")
+
+                # Also record 5s of white and pink noise for future use
+                from time import sleep
+                import soundfile as sf
+                import numpy as np
+
+                print("[🎙] Recording white noise (5s)...")
+                white, _ = sf.read("test_signals/white_noise.wav")
+                white = white[:240000]  # 5s at 48kHz
+                sf.write("test_signals/white_recorded.wav", white, 48000)
+
+                print("[🎙] Recording pink noise (5s)...")
+                pink, _ = sf.read("test_signals/pink_noise.wav")
+                pink = pink[:240000]  # 5s at 48kHz
+                sf.write("test_signals/pink_recorded.wav", pink, 48000)
+
+            elif choice == "4":
+                # List available mic recordings
+                all_mics = sorted([d for d in os.listdir("recordings") if os.path.isdir(os.path.join("recordings", d))])
+                print("Available mic recordings:")
+                for i, mic in enumerate(all_mics, 1):
+                    print(f"{i}. {mic}")
+
+                # Auto-suggest last used mic names from config
+                last_test = config.get("audio", "last_test_mic", fallback="")
+                last_ref = config.get("audio", "last_ref_mic", fallback="")
+
+                name_input = input(f"Enter test mic name to process (number or name) [default: {last_test}]: ").strip()
+                if name_input.isdigit() and 1 <= int(name_input) <= len(all_mics):
+                    name = all_mics[int(name_input)-1]
+                else:
+                    name = name_input or last_test
+                test_path = os.path.join("recordings", name)
+                if not os.path.exists(test_path):
+                    print("[!] Test mic folder not found.")
                     continue
-                _, ref_db, _, _ = process_mic_recordings(ref_path)
-
-            freqs, smoothed, std, normalized = process_mic_recordings(test_path, reference_db=ref_db)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            out_folder = os.path.join("output", f"{name}_{timestamp}")
-            os.makedirs(out_folder, exist_ok=True)
-
-            plot_frequency_response(freqs, smoothed, std_db=std, label=name,
-                                    reference_db=ref_db, save_path=os.path.join(out_folder, "response.png"))
-
-            raw_csv_path = os.path.join(out_folder, "response.csv")
-            with open(raw_csv_path, "w") as f:
-                f.write("Frequency (Hz);Smoothed Response (dB);Std Dev (dB)\n")
-                for f_hz, db_val, std_val in zip(freqs, smoothed, std):
-                    f.write(f"{f_hz:.2f};{db_val:.2f};{std_val:.2f}\n")
-            print(f"[✓] Saved response CSV to {raw_csv_path}")
-
-            if normalized is not None:
-                plot_frequency_response(freqs, normalized, label=f"{name} - normalized",
-                                        save_path=os.path.join(out_folder, "normalized.png"))
-                norm_csv_path = os.path.join(out_folder, "normalized.csv")
-                with open(norm_csv_path, "w") as f:
-                    f.write("Frequency (Hz);Normalized Response (dB)\n")
-                    for f_hz, db_val in zip(freqs, normalized):
-                        f.write(f"{f_hz:.2f};{db_val:.2f}\n")
-                print(f"[✓] Saved normalized CSV to {norm_csv_path}")
-
-            meta_path = os.path.join(out_folder, "metadata.json")
-            input_device = get_saved_or_prompt_device("input_device", "Select input device", config, asio_index)
-            output_device = get_saved_or_prompt_device("output_device", "Select output device", config, asio_index)
-
-            input_mode = "left"  # Default input channel mode
-            output_mode = "left"  # Default output channel mode
-            metadata = {
-                "version": "v0.9-beta",
-                "mic_name": name,
-                "timestamp": timestamp,
-                "reference_mic": ref_name if ref_name else None,
-                "output_folder": out_folder,
-                "sweep_file": "test_signals/sweep.wav",
-                "sample_rate": 48000,
-                "num_sweeps": n if n is not None else "N/A",
-                "input_device": sd.query_devices(input_device)["name"] if input_device is not None else None,
-                "output_device": sd.query_devices(output_device)["name"] if output_device is not None else None,
-                "input_channel_mode": input_mode,
-                "output_channel_mode": output_mode
-            }
-
-            # Optional: Process short sweep response
-            short_pattern = os.path.join(test_path, "short_take_*.wav")
-            import glob
-            if glob.glob(short_pattern):
-                freqs_short, smoothed_short, std_short, _ = process_mic_recordings(test_path,
-                                                    sweep_path="test_signals/sweep_short.wav",
-                                                    anomaly_threshold_db=anomaly_threshold_db,
-                                                    smoothing_bins=5)
-                short_plot_path = os.path.join(out_folder, "response_short.png")
-                plot_frequency_response(freqs_short, smoothed_short, std_db=std_short, label=f"{name} (short)",
-                                        save_path=short_plot_path)
-
-                short_csv_path = os.path.join(out_folder, "response_short.csv")
-                with open(short_csv_path, "w") as f:
-                    f.write("Frequency (Hz);Smoothed Response (dB);Std Dev (dB)")
-                    for f_hz, db_val, std_val in zip(freqs_short, smoothed_short, std_short):
-                        f.write(f"{f_hz:.2f};{db_val:.2f};{std_val:.2f}")
-                print(f"[✓] Saved short sweep CSV to {short_csv_path}")
-
-
-                
-            with open(meta_path, "w") as f:
-                json.dump(metadata, f, indent=2)
-            print(f"[✓] Saved metadata to {meta_path}")
-
-            # Log to run history
-            with open("run_history.log", "a") as log:
-                log.write(f"{timestamp} | Test: {name} | Reference: {ref_name} | Output: {out_folder} | Version: v0.9-beta")
-            config["audio"]["last_test_mic"] = name
-            config["audio"]["last_ref_mic"] = ref_name
-
-        elif choice == "5":
-            break
-        else:
-            print("Invalid option.")
 
-        config["processor"]["anomaly_threshold_db"] = str(anomaly_threshold_db)
-    with open(config_path, "w") as f:
-        config.write(f)
+                ref_input = input(f"Enter reference mic name (number or name) [default: {last_ref}]: ").strip()
+                if ref_input.isdigit() and 1 <= int(ref_input) <= len(all_mics):
+                    ref_name = all_mics[int(ref_input)-1]
+                else:
+                    ref_name = ref_input or last_ref
+                ref_db = None
+                if ref_name:
+                    ref_path = os.path.join("recordings", f"ref_{ref_name}")
+                    if not os.path.exists(ref_path):
+                        print("[!] Reference mic folder not found.")
+                        continue
+                    _, ref_db, _, _ = process_mic_recordings(ref_path)
+
+                freqs, smoothed, std, normalized, spectra = process_mic_recordings(test_path, reference_db=ref_db,
+                                                                                  return_spectra=True, min_phase=min_phase)
+
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                out_folder = os.path.join("output", f"{name}_{timestamp}")
+                os.makedirs(out_folder, exist_ok=True)
+
+                plot_frequency_response(freqs, smoothed, std_db=std, label=name,
+                                        reference_db=ref_db, save_path=os.path.join(out_folder, "response.png"))
+
+                write_response_csv(os.path.join(out_folder, "response.csv"), freqs, smoothed, std)
+                write_spectra(os.path.join(out_folder, "spectra.npz"), spectra)
+
+                if normalized is not None:
+                    plot_frequency_response(freqs, normalized, label=f"{name} - normalized",
+                                            save_path=os.path.join(out_folder, "normalized.png"))
+                    write_normalized_csv(os.path.join(out_folder, "normalized.csv"), freqs, normalized)
+
+                meta_path = os.path.join(out_folder, "metadata.json")
+                input_device = get_saved_or_prompt_device("input_device", "Select input device", config, asio_index, session)
+                output_device = get_saved_or_prompt_device("output_device", "Select output device", config, asio_index, session)
+
+                input_mode = "left"  # Default input channel mode
+                output_mode = "left"  # Default output channel mode
+                signals_info = load_manifest("test_signals")["signals"]
+                input_name = session.device_info(input_device)["name"] if input_device is not None else None
+                output_name = session.device_info(output_device)["name"] if output_device is not None else None
+                metadata = {
+                    "version": "v0.9-beta",
+                    "mic_name": name,
+                    "timestamp": timestamp,
+                    "reference_mic": ref_name if ref_name else None,
+                    "output_folder": out_folder,
+                    "sweep_file": "test_signals/sweep.wav",
+                    "sweep_sha256": signals_info.get("sweep.wav", {}).get("sha256"),
+                    "sample_rate": 48000,
+                    "num_sweeps": n if n is not None else "N/A",
+                    "input_device": input_name,
+                    "output_device": output_name,
+                    "input_channel_mode": input_mode,
+                    "output_channel_mode": output_mode
+                }
+
+                # Optional: Process short sweep response
+                short_pattern = os.path.join(test_path, "short_take_*.wav")
+                import glob
+                if glob.glob(short_pattern):
+                    freqs_short, smoothed_short, std_short, _ = process_mic_recordings(test_path,
+                                                        sweep_path="test_signals/sweep_short.wav",
+                                                        anomaly_threshold_db=anomaly_threshold_db,
+                                                        smoothing_bins=5,
+                                                        pattern="short_take_*.wav")
+                    short_plot_path = os.path.join(out_folder, "response_short.png")
+                    plot_frequency_response(freqs_short, smoothed_short, std_db=std_short, label=f"{name} (short)",
+                                            save_path=short_plot_path)
+
+                    write_response_csv(os.path.join(out_folder, "response_short.csv"), freqs_short, smoothed_short, std_short)
+
+                write_metadata(meta_path, metadata)
+                profiler.write(out_folder, extra={"mic_name": name, "action": "process"})
+
+                # Log to run history
+                append_run_history(timestamp, name, ref_name, out_folder)
+                config["audio"]["last_test_mic"] = name
+                config["audio"]["last_ref_mic"] = ref_name
+
+            elif choice == "5":
+                ensure_test_signals("test_signals")
+                input_device = get_saved_or_prompt_device("input_device", "Select input device", config, asio_index, session)
+                output_device = get_saved_or_prompt_device("output_device", "Select output device", config, asio_index, session)
+                input_mode = input("Input channel mode (left/right/stereo) [left]: ").strip().lower() or "left"
+                output_mode = input("Output channel mode (left/right/stereo) [left]: ").strip().lower() or "left"
+                count = input("Number of sweeps [3]: ").strip()
+                n = int(count) if count.isdigit() else 3
+
+                last_ref = config.get("audio", "last_ref_mic", fallback="")
+                ref_name = input(f"Enter reference mic name [default: {last_ref}]: ").strip() or last_ref
+                ref_db = None
+                if ref_name:
+                    ref_path = os.path.join("recordings", f"ref_{ref_name}")
+                    if not os.path.exists(ref_path):
+                        print("[!] Reference mic folder not found.")
+                        continue
+                    _, ref_db, _, _ = process_mic_recordings(ref_path)
+
+                if "station" not in config:
+                    config["station"] = {}
+                workers = config["station"].getint("processing_workers", fallback=2)
+                device_names = {"input_device": session.device_info(input_device)["name"],
+                                "output_device": session.device_info(output_device)["name"]}
+                results = run_station(input_device, output_device, input_mode, output_mode, repeats=n,
+                                      reference_db=ref_db, ref_name=ref_name or None,
+                                      anomaly_threshold_db=anomaly_threshold_db, workers=workers, min_phase=min_phase,
+                                      metadata=dict(device_names, version="v0.9-beta"), session=session)
+                if results:
+                    config["audio"]["last_test_mic"] = results[-1]["name"]
+                config["audio"]["last_ref_mic"] = ref_name
+                config["station"]["processing_workers"] = str(workers)
+
+            elif choice == "6":
+                validate = input("Validate filters against recorded takes? (y/N): ").strip().lower() in ("y", "yes")
+                try:
+                    batch_design_corrections(validate=validate, **correction_settings(config))
+                except ValueError as e:
+                    print(f"[!] Check [correction] in settings.ini: {e}")
+
+            elif choice == "7":
+                try:
+                    match_inventory(**matching_settings(config))
+                except ValueError as e:
+                    print(f"[!] Check [matching] in settings.ini: {e}")
+
+            elif choice == "8":
+                if "polar" not in config:
+                    config["polar"] = {}
+                mode = input("Record new polar session or process existing? (r/p) [r]: ").strip().lower() or "r"
+                name = input("Enter mic name: ").strip()
+                folder = os.path.join("recordings", f"polar_{name}")
+                if mode == "r":
+                    ensure_test_signals("test_signals")
+                    input_device = get_saved_or_prompt_device("input_device", "Select input device", config, asio_index, session)
+                    output_device = get_saved_or_prompt_device("output_device", "Select output device", config, asio_index, session)
+                    input_mode = input("Input channel mode (left/right/stereo) [left]: ").strip().lower() or "left"
+                    output_mode = input("Output channel mode (left/right/stereo) [left]: ").strip().lower() or "left"
+                    step = float(config["polar"].get("angle_step", "5"))
+                    repeats = int(config["polar"].get("repeats", "1"))
+                    turntable_name = config["polar"].get("turntable", "manual")
+                    if turntable_name not in TURNTABLES:
+                        print(f"[!] Unknown turntable '{turntable_name}', options: {', '.join(TURNTABLES)}")
+                        continue
+                    turntable = TURNTABLES[turntable_name]()
+                    try:
+                        record_polar_session(name, angle_set(step), turntable, input_device, output_device,
+                                             input_mode, output_mode, repeats=repeats, session=session)
+                    finally:
+                        turntable.close()
+                elif not os.path.exists(os.path.join(folder, "polar.json")):
+                    print("[!] Polar session folder not found.")
+                    continue
+                out_folder = process_polar_session(folder)[0]
+                profiler.write(out_folder, extra={"mic_name": name, "action": "polar"})
+
+            elif choice == "9":
+                break
+            else:
+                print("Invalid option.")
+
+            config["processor"]["anomaly_threshold_db"] = str(anomaly_threshold_db)
+            config["processor"]["minimum_phase"] = str(min_phase).lower()
+    finally:
+        session.close()
+        with open(config_path, "w") as f:
+            config.write(f)
 
 
-def record_mic(name, is_reference=False, config=None, asio_index=None, anomaly_threshold_db=6):
+def record_mic(name, is_reference=False, config=None, asio_index=None, anomaly_threshold_db=6, session=None):
+    from recorder import record_mic_response, record_noise_samples
+
     prefix = "ref_" if is_reference else ""
     path = os.path.join("recordings", f"{prefix}{name}")
-    input_device = get_saved_or_prompt_device("input_device", "Select input device", config, asio_index)
-    output_device = get_saved_or_prompt_device("output_device", "Select output device", config, asio_index)
+    input_device = get_saved_or_prompt_device("input_device", "Select input device", config, asio_index, session)
+    output_device = get_saved_or_prompt_device("output_device", "Select output device", config, asio_index, session)
 
     input_mode = input("Input channel mode (left/right/stereo) [left]: ").strip().lower() or "left"
     output_mode = input("Output channel mode (left/right/stereo) [left]: ").strip().lower() or "left"
@@ -241,7 +351,8 @@ def record_mic(name, is_reference=False, config=None, asio_index=None, anomaly_t
                         input_channel_mode=input_mode,
                         output_channel_mode=output_mode,
                         repeats=1,
-                        output_filename="ambient_noise.wav")
+                        output_filename="ambient_noise.wav",
+                        session=session)
 
     # Full sweeps
     while True:
@@ -250,7 +361,8 @@ def record_mic(name, is_reference=False, config=None, asio_index=None, anomaly_t
                             output_device=output_device,
                             input_channel_mode=input_mode,
                             output_channel_mode=output_mode,
-                            repeats=n)
+                            repeats=n,
+                            session=session)
         anomalies_detected = detect_anomalies(name, path, anomaly_threshold_db)
         if not anomalies_detected:
             break
@@ -264,14 +376,15 @@ def record_mic(name, is_reference=False, config=None, asio_index=None, anomaly_t
                             input_channel_mode=input_mode,
                             output_channel_mode=output_mode,
                             repeats=n,
-                            output_filename_prefix="short_take_")
+                            output_filename_prefix="short_take_",
+                            session=session)
         anomalies_detected = detect_anomalies(name + "_short", path, anomaly_threshold_db,
                                               pattern="short_take_*.wav", sweep_path="test_signals/sweep_short.wav")
         if not anomalies_detected:
             break
 
     # White and pink noise
-    record_noise_samples(path, input_device, output_device, input_mode, output_mode)
+    record_noise_samples(path, input_device, output_device, input_mode, output_mode, session=session)
     print("[✓] Recording completed.")
 
 
@@ -279,5 +392,8 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "test":
         print("[TEST] Running system tests...")
         # Add test functions here
+    elif len(sys.argv) > 1 and sys.argv[1] == "profile-report":
+        os.makedirs("output", exist_ok=True)
+        print_profile_report(aggregate_profiles(save_path=os.path.join("output", "profile_report.json")))
     else:
-        menu()
+        menu(profile="--profile" in sys.argv)
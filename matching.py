@@ -0,0 +1,209 @@
+# matching.py
+import glob
+import json
+import os
+from datetime import datetime
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from utils import interp_rows, log_frequency_grid
+from instrumentation import profiler
+
+METRICS = ("max", "rms")
+
+
+def load_responses(output_root="output", filename="response.csv", f_low=20.0, f_high=20000.0, points_per_octave=24):
+    """
+    Load stored responses onto a common log frequency grid. If a mic was
+    processed several times only its latest output folder is used.
+    Returns (names, folders, grid, responses) with responses shaped (units, grid).
+    """
+    latest = {}
+    for path in sorted(glob.glob(os.path.join(output_root, "*", filename))):
+        folder = os.path.dirname(path)
+        name = os.path.basename(folder).rsplit("_", 2)[0]
+        meta_path = os.path.join(folder, "metadata.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                name = json.load(f).get("mic_name", name)
+        latest[name] = folder  # sorted paths: later timestamps overwrite earlier ones
+
+    grid = log_frequency_grid(f_low, f_high, points_per_octave)
+    names = sorted(latest)
+    folders = [latest[n] for n in names]
+    responses = np.empty((len(names), len(grid)))
+    with profiler.stage("load_responses"):
+        for i, folder in enumerate(folders):
+            data = np.loadtxt(os.path.join(folder, filename), delimiter=";", skiprows=1, ndmin=2)
+            responses[i] = interp_rows(grid, data[:, 0], data[:, 1])
+    return names, folders, grid, responses
+
+
+def _band_masks(grid, bands):
+    masks = [(grid >= lo) & (grid <= hi) for lo, hi in bands]
+    return [m for m in masks if np.any(m)]
+
+
+def deviation_matrix(responses, grid, bands=((100.0, 10000.0),), metric="max", align_level=True, block_size=128):
+    """
+    Pairwise deviation (dB) between all units: the metric (max or RMS of the
+    dB difference) is computed per band and the worst band is kept.
+    RMS uses the Gram-matrix identity; max is computed in blocks of
+    block_size x block_size units to bound memory.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+    n = len(responses)
+    dist = np.zeros((n, n))
+    with profiler.stage("deviation_matrix"):
+        for mask in _band_masks(grid, bands):
+            r = responses[:, mask]
+            if align_level:
+                r = r - r.mean(axis=1, keepdims=True)  # compare shape, not sensitivity
+            if metric == "rms":
+                sq = np.sum(r ** 2, axis=1)
+                d2 = (sq[:, None] + sq[None, :] - 2 * r @ r.T) / r.shape[1]
+                band = np.sqrt(np.maximum(d2, 0))
+            else:
+                band = np.zeros((n, n))
+                for i0 in range(0, n, block_size):
+                    a = r[i0:i0 + block_size]
+                    for j0 in range(i0, n, block_size):
+                        b = r[j0:j0 + block_size]
+                        block = np.max(np.abs(a[:, None, :] - b[None, :, :]), axis=-1)
+                        band[i0:i0 + len(a), j0:j0 + len(b)] = block
+                        band[j0:j0 + len(b), i0:i0 + len(a)] = block.T
+            np.maximum(dist, band, out=dist)
+    np.fill_diagonal(dist, 0)
+    return dist
+
+
+def pair_units(dist, tolerance_db=None):
+    """
+    Pair units minimizing total deviation. A linear assignment on the
+    symmetric cost matrix gives mutual (2-cycle) pairs; units left in longer
+    cycles are paired greedily by smallest deviation. Pairs above
+    tolerance_db are dropped. Returns (pairs, unmatched).
+    """
+    n = len(dist)
+    cost = dist.copy()
+    np.fill_diagonal(cost, np.max(dist) * 10 + 1 if n else 1)
+    with profiler.stage("assignment"):
+        _, cols = linear_sum_assignment(cost)
+
+    pairs = []
+    free = np.ones(n, dtype=bool)
+    for i, j in enumerate(cols):
+        if i < j and cols[j] == i:
+            pairs.append((i, int(j)))
+            free[i] = free[j] = False
+
+    left = np.flatnonzero(free)
+    if len(left) > 1:
+        sub = dist[np.ix_(left, left)]
+        iu, ju = np.triu_indices(len(left), k=1)
+        for k in np.argsort(sub[iu, ju], kind="stable"):
+            i, j = left[iu[k]], left[ju[k]]
+            if free[i] and free[j]:
+                pairs.append((int(i), int(j)))
+                free[i] = free[j] = False
+
+    if tolerance_db is not None:
+        rejected = [p for p in pairs if dist[p] > tolerance_db]
+        pairs = [p for p in pairs if dist[p] <= tolerance_db]
+        for i, j in rejected:
+            free[i] = free[j] = True
+    pairs.sort(key=lambda p: dist[p])
+    return pairs, [int(i) for i in np.flatnonzero(free)]
+
+
+def group_units(dist, group_size=4, tolerance_db=None):
+    """
+    Greedy complete-linkage grouping into matched sets of group_size. Tightest
+    seeds go first; each step adds the unit with the smallest maximum
+    deviation to the current members. Returns (groups, unmatched).
+    """
+    if group_size == 2:
+        return pair_units(dist, tolerance_db)
+    n = len(dist)
+    free = np.ones(n, dtype=bool)
+    k = min(group_size - 1, max(n - 1, 1))
+    masked = dist + np.diag(np.full(n, np.inf))
+    tightness = np.sort(masked, axis=1)[:, :k].max(axis=1) if n > 1 else np.zeros(n)
+    groups = []
+    with profiler.stage("grouping"):
+        for seed in np.argsort(tightness, kind="stable"):
+            if not free[seed] or free.sum() < group_size:
+                continue
+            members = [int(seed)]
+            worst = dist[seed].copy()
+            candidates = free.copy()
+            candidates[seed] = False
+            while len(members) < group_size:
+                score = np.where(candidates, worst, np.inf)
+                nxt = int(np.argmin(score))
+                if not np.isfinite(score[nxt]) or (tolerance_db is not None and score[nxt] > tolerance_db):
+                    break
+                members.append(nxt)
+                candidates[nxt] = False
+                np.maximum(worst, dist[nxt], out=worst)
+            if len(members) == group_size:
+                groups.append(tuple(members))
+                free[members] = False
+    return groups, [int(i) for i in np.flatnonzero(free)]
+
+
+def write_matches_csv(path, groups, unmatched, names, dist):
+    with open(path, "w") as f:
+        f.write("Group;Units;Max deviation (dB)\n")
+        for g, members in enumerate(groups, 1):
+            worst = max(dist[i, j] for i in members for j in members)
+            f.write(f"{g};{','.join(names[i] for i in members)};{worst:.2f}\n")
+        for i in unmatched:
+            f.write(f"-;{names[i]};\n")
+    print(f"[✓] Saved matches to {path}")
+
+
+def match_inventory(output_root="output", group_size=2, metric="max", tolerance_db=None,
+                    bands=((100.0, 10000.0),), align_level=True, save=True):
+    """
+    Load all stored responses, compute the deviation matrix and solve the
+    pairing (group_size=2) or grouping. Writes output/matches_<timestamp>.csv.
+    """
+    if group_size < 2:
+        raise ValueError(f"group_size must be at least 2 (pairs), got {group_size}")
+    names, folders, grid, responses = load_responses(output_root)
+    if len(names) < group_size:
+        print(f"[!] Need at least {group_size} stored responses, found {len(names)}")
+        return [], list(range(len(names))), names
+    print(f"[🔗] Matching {len(names)} units into sets of {group_size} ({metric} metric)...")
+    dist = deviation_matrix(responses, grid, bands=bands, metric=metric, align_level=align_level)
+    groups, unmatched = group_units(dist, group_size, tolerance_db)
+    print(f"[✓] {len(groups)} matched set(s), {len(unmatched)} unit(s) unmatched")
+    if save:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        write_matches_csv(os.path.join(output_root, f"matches_{timestamp}.csv"), groups, unmatched, names, dist)
+    return groups, unmatched, names
+
+
+def matching_settings(config):
+    """
+    Read [matching] settings from a ConfigParser as match_inventory kwargs.
+    """
+    section = config["matching"] if "matching" in config else {}
+    get = section.get
+    tolerance = get("tolerance_db", "")
+    return {
+        "group_size": int(get("group_size", "2")),
+        "metric": get("metric", "max"),
+        "tolerance_db": float(tolerance) if tolerance else None,
+        "bands": ((float(get("f_low", "100")), float(get("f_high", "10000"))),),
+        "align_level": config.getboolean("matching", "align_level", fallback=True),
+    }
+
+
+if __name__ == "__main__":
+    import configparser
+
+    config = configparser.ConfigParser()
+    config.read("settings.ini")
+    match_inventory(**matching_settings(config))
@@ -2,10 +2,12 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+from instrumentation import profiler
 
-def plot_frequency_response(freqs, response_db, std_db=None, label="Mic", reference_db=None, save_path=None):
+def plot_frequency_response(freqs, response_db, std_db=None, label="Mic", reference_db=None, save_path=None, show=True):
     """
     Plot and optionally save frequency response graph.
+    With show=False the figure is closed instead of displayed (for background workers).
     """
     plt.figure(figsize=(10, 6))
     plt.plot(freqs, response_db, label=label)
@@ -33,10 +35,42 @@ def plot_frequency_response(freqs, response_db, std_db=None, label="Mic", refere
 
     if save_path:
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        plt.savefig(save_path, dpi=300)
+        with profiler.stage("plot_save"):
+            plt.savefig(save_path, dpi=300)
         print(f"[✓] Saved plot to {save_path}")
 
-    plt.show()
+    if show:
+        plt.show()
+    else:
+        plt.close()
+
+
+def plot_polar_pattern(angles, levels_db, band_labels, label="Mic", save_path=None, show=True, floor_db=-30):
+    """
+    Plot relative band levels (angles x bands, dB re on-axis) as a polar pattern.
+    """
+    theta = np.radians(np.append(angles, angles[0]))  # close the curve
+    plt.figure(figsize=(8, 8))
+    ax = plt.subplot(projection="polar")
+    ax.set_theta_zero_location("N")
+    ax.set_theta_direction(-1)
+    for b, band in enumerate(band_labels):
+        levels = np.maximum(np.append(levels_db[:, b], levels_db[0, b]), floor_db)
+        ax.plot(theta, levels, label=band)
+    ax.set_rlim(floor_db, max(6, float(np.max(levels_db)) + 1))
+    ax.set_title(f"{label} - Polar Pattern (dB re on-axis)")
+    ax.legend(loc="lower left", bbox_to_anchor=(1.0, 0.0), fontsize="small")
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with profiler.stage("plot_save"):
+            plt.savefig(save_path, dpi=300, bbox_inches="tight")
+        print(f"[✓] Saved plot to {save_path}")
+
+    if show:
+        plt.show()
+    else:
+        plt.close()
 
 
 if __name__ == "__main__":
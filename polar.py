@@ -0,0 +1,290 @@
+# polar.py
+import glob
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+import numpy as np
+import soundfile as sf
+from scipy.integrate import trapezoid
+from instrumentation import profiler
+
+OCTAVE_BANDS = (125, 250, 500, 1000, 2000, 4000, 8000, 16000)
+BEAMWIDTH_DROP_DB = 6.0
+
+
+class Turntable(ABC):
+    """
+    Interface for anything that can point the DUT at an angle (degrees).
+    """
+
+    @abstractmethod
+    def move_to(self, angle):
+        pass
+
+    def home(self):
+        self.move_to(0.0)
+
+    def close(self):
+        pass
+
+
+class ManualTurntable(Turntable):
+    """
+    Operator rotates the DUT by hand and confirms each position.
+    """
+
+    def move_to(self, angle):
+        input(f"[↻] Rotate DUT to {angle:.1f}° and press Enter...")
+
+
+class SimulatedTurntable(Turntable):
+    """
+    Stand-in for a motorized turntable: logs moves and waits settle_time.
+    """
+
+    def __init__(self, settle_time=0.0):
+        self.settle_time = settle_time
+        self.position = 0.0
+        self.moves = []
+
+    def move_to(self, angle):
+        print(f"[↻] (simulated) turntable {self.position:.1f}° -> {angle:.1f}°")
+        self.position = angle
+        self.moves.append(angle)
+        time.sleep(self.settle_time)
+
+
+TURNTABLES = {
+    "manual": ManualTurntable,
+    "simulated": SimulatedTurntable,
+}
+
+
+def angle_folder(session_folder, angle):
+    return os.path.join(session_folder, f"angle_{angle:05.1f}")
+
+
+def angle_set(step=5.0, start=0.0, stop=360.0):
+    """
+    Angles from start (inclusive) to stop (exclusive) in step degrees.
+    """
+    return [float(a) for a in np.arange(start, stop, step)]
+
+
+def angle_takes(session_folder, angle):
+    return sorted(glob.glob(os.path.join(angle_folder(session_folder, angle), "mic_take_*.wav")))
+
+
+def record_polar_session(name, angles, turntable, input_device=None, output_device=None,
+                         input_mode="left", output_mode="left", repeats=1,
+                         sweep_path="test_signals/sweep.wav", session=None):
+    """
+    Record every angle into recordings/polar_<name>/angle_<deg>/. polar.json is
+    updated after each angle, so an interrupted session can be processed as is
+    or resumed: angles that already have `repeats` takes are skipped.
+    Returns the session folder.
+    """
+    from recorder import record_mic_response
+    from signal_manifest import signal_sha256
+
+    folder = os.path.join("recordings", f"polar_{name}")
+    os.makedirs(folder, exist_ok=True)
+    info = {
+        "mic_name": name,
+        "angles": [],
+        "planned_angles": list(angles),
+        "repeats": repeats,
+        "turntable": type(turntable).__name__,
+        "sweep_file": sweep_path,
+        "sweep_sha256": signal_sha256(sweep_path),
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+    }
+    for i, angle in enumerate(angles, 1):
+        if len(angle_takes(folder, angle)) >= repeats:
+            print(f"[ℹ] Angle {angle:.1f}° already recorded, skipping")
+        else:
+            print(f"[📐] Angle {angle:.1f}° ({i}/{len(angles)})")
+            with profiler.stage("turntable_move"):
+                turntable.move_to(angle)
+            record_mic_response(angle_folder(folder, angle),
+                                sweep_path=sweep_path,
+                                input_device=input_device,
+                                output_device=output_device,
+                                input_channel_mode=input_mode,
+                                output_channel_mode=output_mode,
+                                repeats=repeats,
+                                session=session)
+        info["angles"].append(angle)
+        with open(os.path.join(folder, "polar.json"), "w") as f:
+            json.dump(info, f, indent=2)
+    turntable.home()
+    print(f"[✓] Polar session saved to {folder}")
+    return folder
+
+
+def load_polar_session(folder, sweep_path="test_signals/sweep.wav"):
+    """
+    Load all takes of a polar session into one preallocated float32
+    (angle, take, samples) tensor.
+    """
+    from signal_manifest import verify_take_excitation
+
+    with open(os.path.join(folder, "polar.json")) as f:
+        info = json.load(f)
+    angles = np.array(info["angles"], dtype=float)
+    paths = [angle_takes(folder, angle) for angle in angles]
+    count = min((len(p) for p in paths), default=0)
+    if count == 0:
+        raise ValueError(f"Polar session {folder} has angles without takes")
+    for angle, angle_paths in zip(angles, paths):
+        verify_take_excitation(angle_folder(folder, angle), angle_paths, sweep_path)
+    length = min(sf.info(path).frames for p in paths for path in p[:count])
+
+    tensor = np.empty((len(angles), count, length), dtype=np.float32)
+    with profiler.stage("file_read"):
+        for a, angle_paths in enumerate(paths):
+            for t, path in enumerate(angle_paths[:count]):
+                recorded, _ = sf.read(path, frames=length, dtype="float32", always_2d=True)
+                tensor[a, t] = recorded[:, 0]
+    return info, angles, tensor
+
+
+def process_polar_tensor(tensor, sweep, fs=48000, smoothing_bins=5, chunk_angles=8):
+    """
+    Deconvolve and transform an (angle, take, samples) tensor in batched FFT
+    passes (chunk_angles angles at a time to bound memory). Returns freqs and
+    the take-averaged, smoothed dB response per angle, shaped (angle, bins).
+    """
+    from processor import deconvolve_batch, compute_frequency_response_batch
+    from utils import smooth_response
+
+    responses = []
+    for a0 in range(0, len(tensor), chunk_angles):
+        chunk = tensor[a0:a0 + chunk_angles].astype(np.float64)  # full precision per chunk only
+        irs = deconvolve_batch(chunk, sweep, keep=fs)
+        freqs, mag_db = compute_frequency_response_batch(irs, fs)
+        responses.append(mag_db.mean(axis=1))
+    with profiler.stage("smoothing"):
+        smoothed = smooth_response(np.concatenate(responses), window_bins=smoothing_bins)
+    return freqs, smoothed
+
+
+def band_levels(freqs, response_db, bands=OCTAVE_BANDS):
+    """
+    Octave band levels (power average) for every row of response_db.
+    Returns (rows, bands).
+    """
+    power = 10 ** (response_db / 10)
+    levels = []
+    for fc in bands:
+        mask = (freqs >= fc / np.sqrt(2)) & (freqs < fc * np.sqrt(2))
+        levels.append(10 * np.log10(np.mean(power[..., mask], axis=-1)))
+    return np.stack(levels, axis=-1)
+
+
+def directivity_index(angles, levels_rel_db):
+    """
+    Directivity index per band from a single-plane polar, assuming rotational
+    symmetry about the on-axis direction. angles in degrees, levels relative
+    to on-axis shaped (angles, bands).
+    """
+    theta = np.radians(np.minimum(angles % 360, 360 - angles % 360))  # fold to 0..180°
+    order = np.argsort(theta, kind="stable")
+    theta_sorted, power = theta[order], 10 ** (levels_rel_db[order] / 10)
+    # Average both sides where the same off-axis angle was measured twice
+    unique_theta, inverse = np.unique(theta_sorted, return_inverse=True)
+    mean_power = np.zeros((len(unique_theta), power.shape[1]))
+    np.add.at(mean_power, inverse, power)
+    mean_power /= np.bincount(inverse)[:, None]
+    if len(unique_theta) < 2:
+        return np.zeros(power.shape[1])
+    weights = np.sin(unique_theta)
+    sphere_mean = trapezoid(mean_power * weights[:, None], unique_theta, axis=0) / trapezoid(weights, unique_theta)
+    return 10 * np.log10(mean_power[0] / sphere_mean)
+
+
+def beamwidth(angles, levels_rel_db, drop_db=BEAMWIDTH_DROP_DB):
+    """
+    Total angle (degrees) around on-axis where the level stays above
+    -drop_db, per band, with linear interpolation of the crossings.
+    Returns 360 if the level never drops that far.
+    """
+    order = np.argsort(angles % 360)
+    a = (angles % 360)[order]
+    lv = levels_rel_db[order]
+    on_axis = int(np.argmin(np.minimum(a, 360 - a)))
+    n = len(a)
+    widths = []
+    for b in range(lv.shape[1]):
+        sides = []
+        for direction in (1, -1):
+            covered = 0.0
+            prev_angle, prev_level = 0.0, lv[on_axis, b]
+            for step in range(1, n):
+                idx = (on_axis + direction * step) % n
+                delta = ((a[idx] - a[on_axis]) * direction) % 360
+                level = lv[idx, b]
+                if level < -drop_db:
+                    covered = prev_angle + (delta - prev_angle) * (prev_level + drop_db) / (prev_level - level)
+                    break
+                prev_angle, prev_level = delta, level
+            else:
+                covered = None
+            sides.append(covered)
+        widths.append(360.0 if None in sides else min(sides[0] + sides[1], 360.0))
+    return np.array(widths)
+
+
+def process_polar_session(folder, sweep_path="test_signals/sweep.wav", fs=48000, bands=OCTAVE_BANDS,
+                          smoothing_bins=5, show=True):
+    """
+    Batch-process a polar session folder and export polar plot, band levels,
+    directivity index and beamwidth into output/polar_<name>_<timestamp>/.
+    """
+    from plotter import plot_polar_pattern
+    from exporter import write_metadata
+
+    info, angles, tensor = load_polar_session(folder, sweep_path)
+    sweep, _ = sf.read(sweep_path)
+    print(f"[📐] Processing polar tensor {tensor.shape} (angle × take × samples)...")
+    freqs, responses = process_polar_tensor(tensor, sweep, fs, smoothing_bins)
+
+    levels = band_levels(freqs, responses, bands)
+    on_axis = int(np.argmin(np.minimum(angles % 360, 360 - angles % 360)))
+    relative = levels - levels[on_axis]
+    di = directivity_index(angles, relative)
+    bw = beamwidth(angles, relative)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_folder = os.path.join("output", f"polar_{info['mic_name']}_{timestamp}")
+    os.makedirs(out_folder, exist_ok=True)
+
+    with profiler.stage("csv_export"):
+        with open(os.path.join(out_folder, "polar_levels.csv"), "w") as f:
+            f.write("Angle (deg);" + ";".join(f"{fc} Hz (dB)" for fc in bands) + "\n")
+            for angle, row in zip(angles, relative):
+                f.write(f"{angle:.1f};" + ";".join(f"{v:.2f}" for v in row) + "\n")
+        with open(os.path.join(out_folder, "directivity.csv"), "w") as f:
+            f.write("Band (Hz);Directivity Index (dB);Beamwidth -6 dB (deg)\n")
+            for fc, d, w in zip(bands, di, bw):
+                f.write(f"{fc};{d:.2f};{w:.1f}\n")
+        np.savez_compressed(os.path.join(out_folder, "polar_response.npz"),
+                            angles=angles, freqs=freqs, response_db=responses)
+    print(f"[✓] Saved polar CSVs to {out_folder}")
+
+    plot_polar_pattern(angles, relative, [f"{fc} Hz" for fc in bands], label=info["mic_name"],
+                       save_path=os.path.join(out_folder, "polar.png"), show=show)
+    write_metadata(os.path.join(out_folder, "metadata.json"), dict(info, output_folder=out_folder,
+                                                                    processed=timestamp, session_folder=folder))
+    return out_folder, angles, relative, di, bw
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        process_polar_session(sys.argv[1])
+    else:
+        print("Usage: python polar.py recordings/polar_<name>")
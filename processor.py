@@ -2,8 +2,9 @@
 import numpy as np
 import soundfile as sf
 from scipy.signal import fftconvolve
-from scipy.fft import rfft, rfftfreq
+from scipy.fft import rfft, irfft, rfftfreq, next_fast_len
 import os
+from instrumentation import profiler
 
 
 def deconvolve(recorded, sweep, epsilon=1e-8):
@@ -13,10 +14,39 @@ def deconvolve(recorded, sweep, epsilon=1e-8):
     """
     # Time-reverse sweep
     inv_sweep = sweep[::-1] / (np.max(np.abs(sweep)) + epsilon)
-    ir = fftconvolve(recorded, inv_sweep, mode='full')
+    with profiler.stage("deconvolution"):
+        ir = fftconvolve(recorded, inv_sweep, mode='full')
     return ir
 
 
+def deconvolve_batch(recorded, sweep, keep=None, epsilon=1e-8):
+    """
+    Deconvolve a batch of recordings (..., samples) with the same sweep in one
+    FFT pass along the last axis. Matches deconvolve() per row; only the
+    first `keep` samples of each impulse response are returned if given.
+    """
+    inv_sweep = sweep[::-1] / (np.max(np.abs(sweep)) + epsilon)
+    n = recorded.shape[-1] + len(inv_sweep) - 1
+    nfft = next_fast_len(n, real=True)
+    with profiler.stage("deconvolution"):
+        spectrum = rfft(recorded, nfft, axis=-1) * rfft(inv_sweep, nfft)
+        ir = irfft(spectrum, nfft, axis=-1)
+    return ir[..., :min(n, keep) if keep else n]
+
+
+def compute_frequency_response_batch(irs, fs):
+    """
+    Batched compute_frequency_response over the last axis of irs.
+    Returns frequency bins and dB magnitudes shaped (..., bins).
+    """
+    N = min(irs.shape[-1], fs)
+    windowed = irs[..., :N] * np.hanning(N)  # Window 1 second
+    with profiler.stage("fft"):
+        spectrum = np.abs(rfft(windowed, axis=-1))
+    spectrum[spectrum == 0] = 1e-12
+    return rfftfreq(N, 1 / fs), 20 * np.log10(spectrum)
+
+
 def compute_frequency_response(ir, fs):
     """
     Compute magnitude spectrum from impulse response.
@@ -25,12 +55,55 @@ def compute_frequency_response(ir, fs):
     N = len(ir)
     N = min(len(ir), fs)
     windowed = ir[:N] * np.hanning(N)  # Window 1 second
-    spectrum = np.abs(rfft(windowed))
+    with profiler.stage("fft"):
+        spectrum = np.abs(rfft(windowed))
     spectrum[spectrum == 0] = 1e-12
     magnitude_db = 20 * np.log10(spectrum)
     freqs = rfftfreq(len(windowed), 1 / fs)
     return freqs, magnitude_db
 
+
+def minimum_phase_spectrum(magnitude, n):
+    """
+    Reconstruct the minimum-phase spectrum with the given linear magnitude
+    (rfft layout, n-point FFT) using the folded real cepstrum.
+    """
+    cepstrum = irfft(np.log(np.maximum(magnitude, 1e-12)), n)
+    fold = np.zeros(n)
+    fold[0] = 1
+    fold[1:(n + 1) // 2] = 2
+    if n % 2 == 0:
+        fold[n // 2] = 1
+    return np.exp(rfft(cepstrum * fold))
+
+
+def compute_complex_response(ir, fs, min_phase=True):
+    """
+    Compute complex spectrum, dB magnitude, unwrapped phase and group delay
+    from a single FFT of the windowed impulse response.
+    Optionally adds the minimum-phase reconstruction of the magnitude.
+    """
+    N = min(len(ir), fs)
+    windowed = ir[:N] * np.hanning(N)  # Window 1 second
+    with profiler.stage("fft"):
+        spectrum = rfft(windowed)
+    freqs = rfftfreq(N, 1 / fs)
+    magnitude = np.abs(spectrum)
+    magnitude[magnitude == 0] = 1e-12
+    phase = np.unwrap(np.angle(spectrum))
+    result = {
+        "freqs": freqs,
+        "n_fft": N,
+        "spectrum": spectrum,
+        "magnitude_db": 20 * np.log10(magnitude),
+        "phase": phase,
+        "group_delay": -np.gradient(phase, 2 * np.pi * freqs),
+    }
+    if min_phase:
+        result["min_phase_spectrum"] = minimum_phase_spectrum(magnitude, N)
+    return result
+
+
 def detect_anomalies(name, path, anomaly_threshold_db, pattern="mic_take_*.wav", sweep_path="test_signals/sweep.wav"):
     from processor import process_mic_recordings as check_anomalies, compute_frequency_response, deconvolve
     from plotter import plot_frequency_response
@@ -44,7 +117,8 @@ def detect_anomalies(name, path, anomaly_threshold_db, pattern="mic_take_*.wav",
 
     print(f"[⚠] Checking for anomalies in {name} recordings...")
     # Check for anomalies in the recordings
-    freqs, smoothed, std, _, anomalies = check_anomalies(path, return_anomalies=True, anomaly_threshold_db=anomaly_threshold_db)
+    freqs, smoothed, std, _, anomalies = check_anomalies(path, sweep_path=sweep_path, pattern=pattern, return_anomalies=True,
+                                                         anomaly_threshold_db=anomaly_threshold_db)
     if anomalies:
         print(f"[⚠] Anomalies detected in takes: {anomalies}\n")
         # Plot the frequency response with anomalies highlighted
@@ -72,7 +146,7 @@ def detect_anomalies(name, path, anomaly_threshold_db, pattern="mic_take_*.wav",
         plt.close()
         retry = input(f"[📉] Saved anomaly debug plot to {anomaly_plot} \nRetry recording? (y/N): ").strip().lower()
         if retry in ("y", "yes"):
-            for file in glob.glob(os.path.join(path, "mic_take_*.wav")) + \
+            for file in glob.glob(os.path.join(path, pattern)) + \
                         glob.glob(os.path.join("output", f"{name}_*", "*.png")) + \
                         glob.glob(os.path.join("output", f"{name}_*", "*.csv")) + \
                         glob.glob(os.path.join("output", f"{name}_*", "*.json")):
@@ -89,23 +163,38 @@ def detect_anomalies(name, path, anomaly_threshold_db, pattern="mic_take_*.wav",
             return True
     return False
 
-def process_mic_recordings(folder, sweep_path="test_signals/sweep.wav", fs=48000, reference_db=None, smoothing_bins=5, anomaly_threshold_db=6, return_anomalies=False):
+def process_mic_recordings(folder, sweep_path="test_signals/sweep.wav", fs=48000, reference_db=None, smoothing_bins=5, anomaly_threshold_db=6, return_anomalies=False,
+                           pattern="mic_take_*.wav", return_spectra=False, min_phase=True):
     """
     Load 3 takes, compute average and smoothed frequency response, optionally normalize.
+    Refuses takes whose recorded excitation hash does not match sweep_path.
+    With return_spectra=True a dict with the complex spectra, phase and group delay
+    (see compute_complex_response) is appended to the returned tuple.
     """
     from utils import smooth_response, normalize_response
+    from signal_manifest import verify_take_excitation
 
     sweep, _ = sf.read(sweep_path)
     responses = []
+    take_spectra = []
+    n_fft = None
     anomalies = []
     import glob
 
-    mic_files = sorted(glob.glob(os.path.join(folder, "mic_take_*.wav")))
+    mic_files = sorted(glob.glob(os.path.join(folder, pattern)))
+    verify_take_excitation(folder, mic_files, sweep_path)
     for i, rec_path in enumerate(mic_files, 1):
-        recorded, _ = sf.read(rec_path)
+        with profiler.stage("file_read"):
+            recorded, _ = sf.read(rec_path)
         signal = recorded[:, 0] if recorded.ndim > 1 else recorded
         ir = deconvolve(signal, sweep)
-        freqs, mag_db = compute_frequency_response(ir, fs)
+        if return_spectra:
+            complex_response = compute_complex_response(ir, fs, min_phase=False)  # only the average needs it
+            freqs, mag_db = complex_response["freqs"], complex_response["magnitude_db"]
+            take_spectra.append(complex_response["spectrum"])
+            n_fft = complex_response["n_fft"]
+        else:
+            freqs, mag_db = compute_frequency_response(ir, fs)
         responses.append(mag_db)
 
     responses = np.array(responses)
@@ -116,16 +205,44 @@ def process_mic_recordings(folder, sweep_path="test_signals/sweep.wav", fs=48000
             anomalies.append(i + 1)
     std_response = np.std(responses, axis=0)
 
-    smoothed = smooth_response(avg_response, window_bins=smoothing_bins)
+    with profiler.stage("smoothing"):
+        smoothed = smooth_response(avg_response, window_bins=smoothing_bins)
 
     if reference_db is not None:
         normalized = normalize_response(smoothed, reference_db)
     else:
         normalized = None
 
+    result = (freqs, smoothed, std_response, normalized)
     if return_anomalies:
-        return freqs, smoothed, std_response, normalized, anomalies
-    return freqs, smoothed, std_response, normalized
+        result += (anomalies,)
+    if return_spectra:
+        result += (average_spectra(freqs, np.array(take_spectra), avg_response, smoothed, std_response, n_fft, min_phase),)
+    return result
+
+
+def average_spectra(freqs, take_spectra, magnitude_db, smoothed_db, std_db, n_fft, min_phase=True):
+    """
+    Coherently average per-take complex spectra (n_fft-point rfft layout) and
+    derive phase, group delay and optionally the minimum-phase spectrum of
+    the averaged magnitude.
+    """
+    spectrum = np.mean(take_spectra, axis=0)
+    phase = np.unwrap(np.angle(spectrum))
+    spectra = {
+        "freqs": freqs,
+        "n_fft": n_fft,
+        "spectrum": spectrum,
+        "take_spectra": take_spectra,
+        "magnitude_db": magnitude_db,
+        "smoothed_db": smoothed_db,
+        "std_db": std_db,
+        "phase": phase,
+        "group_delay": -np.gradient(phase, 2 * np.pi * freqs),
+    }
+    if min_phase:
+        spectra["min_phase_spectrum"] = minimum_phase_spectrum(10 ** (magnitude_db / 20), n_fft)
+    return spectra
 
 
 if __name__ == "__main__":
@@ -5,8 +5,10 @@ import numpy as np
 import os
 from device_interface import apply_output_panning, extract_mono_channel
 from utils import smooth_response, normalize_response
+from signal_manifest import signal_sha256, record_take_excitation
+from instrumentation import profiler
 
-def record_noise_samples(path, input_device, output_device, input_mode, output_mode):
+def record_noise_samples(path, input_device, output_device, input_mode, output_mode, session=None):
     print("[🎧] Playing and recording white noise (5s, flush=True)...")
     record_mic_response(
         output_folder=path,
@@ -17,7 +19,8 @@ def record_noise_samples(path, input_device, output_device, input_mode, output_m
         input_channel_mode=input_mode,
         output_channel_mode=output_mode,
         repeats=1,
-        output_filename="white_noise.wav"
+        output_filename="white_noise.wav",
+        session=session
     )
 
     print("[🎧] Playing and recording pink noise (5s)...")
@@ -30,24 +33,80 @@ def record_noise_samples(path, input_device, output_device, input_mode, output_m
         input_channel_mode=input_mode,
         output_channel_mode=output_mode,
         repeats=1,
-        output_filename="pink_noise.wav"
+        output_filename="pink_noise.wav",
+        session=session
     )
 
+def _play_record_once(stereo_sweep, fs, input_device, output_device):
+    """
+    Open a stream for a single take, play the buffer and return the (N, 2) recording.
+    """
+    recording = np.zeros((len(stereo_sweep), 2), dtype=np.float32)
+
+    cursor = [0]  # mutable cursor to track playback
+
+    def callback(indata, outdata, frames, time, status):
+        if status:
+            print("[!] Stream warning:", status)
+            profiler.count_stream_status(status)
+
+        start = cursor[0]
+        end = start + frames
+        remaining = len(stereo_sweep) - start
+
+        if remaining >= frames:
+            outdata[:frames, :] = stereo_sweep[start:end]
+        elif remaining > 0:
+            outdata[:remaining, :] = stereo_sweep[start:]
+            outdata[remaining:, :] = 0
+        else:
+            outdata[:, :] = 0
+
+        if end <= len(recording):
+            recording[start:end, :] = indata[:frames, :]
+        else:
+            available = len(recording) - start
+            if available > 0:
+                recording[start:, :] = indata[:available, :]
+
+        cursor[0] += frames
+
+    with profiler.stage("stream_open"):
+        stream = sd.Stream(samplerate=fs,
+                           blocksize=1024,
+                           dtype='float32',
+                           channels=(2, 2),  # 2 in, 2 out (stereo)
+                           device=(input_device, output_device),
+                           callback=callback)
+    with stream, profiler.stage("playback"):
+        while True:
+            sd.sleep(50)
+            if cursor[0] >= len(stereo_sweep):
+                break
+    return recording
+
+
 def record_mic_response(output_folder, sweep_path="test_signals/sweep.wav", fs=48000,
                          input_device=None, output_device=None,
                          input_channel_mode="left", output_channel_mode="left",
-                         repeats=3, output_filename=None, output_filename_prefix=None):
-    # Check for incompatible device host APIs
-    in_info = sd.query_devices(input_device)
-    out_info = sd.query_devices(output_device)
-    if in_info['hostapi'] != out_info['hostapi']:
-        raise ValueError(f"Incompatible devices: input '{in_info['name']}' and output '{out_info['name']}' use different host APIs.")
+                         repeats=3, output_filename=None, output_filename_prefix=None, session=None):
     """
     Play sweep and record mic response using separate input/output devices.
     Applies channel selection and output panning. Saves mono WAVs.
+    With a DeviceSession, takes reuse its cached device info and persistent stream.
     """
+    # Check for incompatible device host APIs
+    if session is not None:
+        session.validate_pair(input_device, output_device)
+    else:
+        with profiler.stage("device_query"):
+            in_info = sd.query_devices(input_device)
+            out_info = sd.query_devices(output_device)
+        if in_info['hostapi'] != out_info['hostapi']:
+            raise ValueError(f"Incompatible devices: input '{in_info['name']}' and output '{out_info['name']}' use different host APIs.")
     os.makedirs(output_folder, exist_ok=True)
     sweep, sweep_fs = sf.read(sweep_path)
+    sweep_sha256 = signal_sha256(sweep_path)
 
     sweep *= 0.8  # default volume if not overridden externally
 
@@ -65,45 +124,10 @@ def record_mic_response(output_folder, sweep_path="test_signals/sweep.wav", fs=4
     for i in range(repeats):
         print(f"[•] Playing sweep and recording take {i+1}/{repeats}...")
 
-        recording = np.zeros((len(sweep), 2), dtype=np.float32)
-
-        cursor = [0]  # mutable cursor to track playback
-
-        def callback(indata, outdata, frames, time, status):
-            if status:
-                print("[!] Stream warning:", status)
-
-            start = cursor[0]
-            end = start + frames
-            remaining = len(stereo_sweep) - start
-
-            if remaining >= frames:
-                outdata[:frames, :] = stereo_sweep[start:end]
-            elif remaining > 0:
-                outdata[:remaining, :] = stereo_sweep[start:]
-                outdata[remaining:, :] = 0
-            else:
-                outdata[:, :] = 0
-
-            if end <= len(recording):
-                recording[start:end, :] = indata[:frames, :]
-            else:
-                available = len(recording) - start
-                if available > 0:
-                    recording[start:, :] = indata[:available, :]
-
-            cursor[0] += frames
-
-        with sd.Stream(samplerate=fs,
-                       blocksize=1024,
-                       dtype='float32',
-                       channels=(2, 2),  # 2 in, 2 out (stereo)
-                       device=(input_device, output_device),
-                       callback=callback):
-            while True:
-                sd.sleep(50)
-                if cursor[0] >= len(stereo_sweep):
-                    break
+        if session is not None:
+            recording = session.play_record(stereo_sweep, fs, input_device, output_device)
+        else:
+            recording = _play_record_once(stereo_sweep, fs, input_device, output_device)
 
         if input_channel_mode == "left":
             mono = extract_mono_channel(recording, 0)
@@ -119,7 +143,10 @@ def record_mic_response(output_folder, sweep_path="test_signals/sweep.wav", fs=4
         else:
             output_path = os.path.join(output_folder, f"mic_take_{i+1}.wav")
 
-        sf.write(output_path, mono, fs)
+        with profiler.stage("file_write"):
+            sf.write(output_path, mono, fs)
+        profiler.count("takes")
+        record_take_excitation(output_folder, os.path.basename(output_path), sweep_path, sweep_sha256)
         print(f"[✓] Saved: {output_path}")
 
     print("[✓] Recording completed.")
@@ -0,0 +1,145 @@
+# signal_manifest.py
+import hashlib
+import json
+import os
+import numpy as np
+import soundfile as sf
+from sweep_generator import generate_log_sweep, generate_white_noise, generate_pink_noise, generate_silence
+
+MANIFEST_NAME = "manifest.json"
+TAKE_MANIFEST_NAME = "takes.json"
+
+GENERATORS = {
+    "log_sweep": generate_log_sweep,
+    "white_noise": generate_white_noise,
+    "pink_noise": generate_pink_noise,
+    "silence": generate_silence,
+}
+
+# File name -> (generator, parameters). Noise seeds are fixed so nodes running
+# the same NumPy version produce identical excitation samples.
+SIGNAL_SPECS = {
+    "sweep.wav": ("log_sweep", {"duration": 10.0, "fs": 48000, "f_start": 20.0, "f_end": 20000.0}),
+    "sweep_short.wav": ("log_sweep", {"duration": 2.0, "fs": 48000, "f_start": 20.0, "f_end": 20000.0}),
+    "white_noise.wav": ("white_noise", {"duration": 10.0, "fs": 48000, "seed": 1}),
+    "pink_noise.wav": ("pink_noise", {"duration": 10.0, "fs": 48000, "seed": 2}),
+    "silence.wav": ("silence", {"duration": 3.0, "samplerate": 48000}),
+}
+
+
+def signal_sha256(path):
+    """
+    Return the SHA-256 hex digest of a WAV file's decoded samples and sample
+    rate. The file header is ignored, so files written by different
+    libsndfile builds hash the same when their samples do.
+    """
+    data, fs = sf.read(path, dtype="float64", always_2d=True)
+    digest = hashlib.sha256(f"fs={fs};shape={data.shape}".encode("utf-8"))
+    digest.update(np.ascontiguousarray(data, dtype="<f8").tobytes())
+    return digest.hexdigest()
+
+
+def params_hash(generator, params):
+    """
+    Return a stable hash of a generator name and its parameters.
+    """
+    payload = json.dumps({"generator": generator, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_manifest(folder="test_signals"):
+    path = os.path.join(folder, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"signals": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, folder="test_signals"):
+    with open(os.path.join(folder, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def ensure_test_signals(folder="test_signals", specs=None, force=False):
+    """
+    Generate test signals lazily. A signal is only regenerated when its
+    parameters changed, its file is missing, or its content no longer matches
+    the hash recorded in the manifest. Returns the manifest.
+    """
+    specs = SIGNAL_SPECS if specs is None else specs
+    os.makedirs(folder, exist_ok=True)
+    manifest = load_manifest(folder)
+    signals = manifest.setdefault("signals", {})
+
+    for filename, (generator, params) in specs.items():
+        path = os.path.join(folder, filename)
+        p_hash = params_hash(generator, params)
+        entry = signals.get(filename)
+        up_to_date = (not force and entry is not None and entry.get("params_hash") == p_hash
+                      and os.path.exists(path) and signal_sha256(path) == entry.get("sha256"))
+        if up_to_date:
+            print(f"[ℹ] {filename} up to date, skipping generation")
+            continue
+
+        GENERATORS[generator](path, **params)
+        signals[filename] = {
+            "generator": generator,
+            "params": params,
+            "seed": params.get("seed"),
+            "params_hash": p_hash,
+            "sha256": signal_sha256(path),
+            "numpy_version": np.__version__,
+        }
+
+    save_manifest(manifest, folder)
+    return manifest
+
+
+def record_take_excitation(folder, filename, excitation_path, excitation_sha256=None):
+    """
+    Record which excitation file (and sample hash) a take was recorded with.
+    """
+    if excitation_sha256 is None:
+        excitation_sha256 = signal_sha256(excitation_path)
+    path = os.path.join(folder, TAKE_MANIFEST_NAME)
+    takes = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            takes = json.load(f)
+    takes[filename] = {"excitation": excitation_path.replace("\\", "/"), "sha256": excitation_sha256}
+    with open(path, "w") as f:
+        json.dump(takes, f, indent=2)
+
+
+def verify_take_excitation(folder, take_paths, sweep_path):
+    """
+    Check that every take in folder was recorded with the same sweep content
+    it is about to be deconvolved with. Raises ValueError on mismatch.
+    """
+    path = os.path.join(folder, TAKE_MANIFEST_NAME)
+    if not take_paths:
+        return
+    if not os.path.exists(path):
+        print(f"[⚠] No {TAKE_MANIFEST_NAME} in {folder}, cannot verify excitation")
+        return
+    with open(path) as f:
+        takes = json.load(f)
+
+    sweep_sha256 = signal_sha256(sweep_path)
+    mismatched = []
+    unknown = []
+    for take_path in take_paths:
+        entry = takes.get(os.path.basename(take_path))
+        if entry is None:
+            unknown.append(os.path.basename(take_path))
+        elif entry["sha256"] != sweep_sha256:
+            mismatched.append(f"{os.path.basename(take_path)} ({entry['excitation']})")
+
+    if unknown:
+        print(f"[⚠] No excitation record for takes: {unknown}")
+    if mismatched:
+        raise ValueError(f"Takes in {folder} were recorded with a different excitation than {sweep_path}: {mismatched}")
+
+
+if __name__ == "__main__":
+    ensure_test_signals("test_signals")
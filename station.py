@@ -0,0 +1,207 @@
+# station.py
+import os
+import queue
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from instrumentation import profiler, enable_profiling
+from signal_manifest import load_manifest
+
+
+def capture_unit(path, input_device, output_device, input_mode, output_mode, repeats, session=None):
+    """
+    Record one DUT without operator interaction: ambient noise, full sweeps,
+    short sweeps and white/pink noise. Anomalies are checked during processing.
+    """
+    from recorder import record_mic_response, record_noise_samples
+
+    record_mic_response(path,
+                        sweep_path="test_signals/silence.wav",
+                        input_device=input_device,
+                        output_device=output_device,
+                        input_channel_mode=input_mode,
+                        output_channel_mode=output_mode,
+                        repeats=1,
+                        output_filename="ambient_noise.wav",
+                        session=session)
+    record_mic_response(path,
+                        input_device=input_device,
+                        output_device=output_device,
+                        input_channel_mode=input_mode,
+                        output_channel_mode=output_mode,
+                        repeats=repeats,
+                        session=session)
+    record_mic_response(path,
+                        sweep_path="test_signals/sweep_short.wav",
+                        input_device=input_device,
+                        output_device=output_device,
+                        input_channel_mode=input_mode,
+                        output_channel_mode=output_mode,
+                        repeats=repeats,
+                        output_filename_prefix="short_take_",
+                        session=session)
+    record_noise_samples(path, input_device, output_device, input_mode, output_mode, session=session)
+
+
+def _init_worker(profile_enabled):
+    import matplotlib
+    matplotlib.use("Agg")  # workers never open plot windows
+    enable_profiling(profile_enabled)
+
+
+def process_unit(job):
+    """
+    Process and export one captured unit. Runs in a worker process, so it
+    only takes and returns picklable data.
+    """
+    from processor import process_mic_recordings
+    from plotter import plot_frequency_response
+    from exporter import write_response_csv, write_normalized_csv, write_metadata, write_spectra
+
+    profiler.reset()
+    name = job["name"]
+    path = job["path"]
+    ref_db = job["reference_db"]
+    freqs, smoothed, std, normalized, anomalies, spectra = process_mic_recordings(
+        path, reference_db=ref_db, anomaly_threshold_db=job["anomaly_threshold_db"], return_anomalies=True,
+        return_spectra=True, min_phase=job["min_phase"])
+
+    out_folder = os.path.join("output", f"{name}_{job['timestamp']}")
+    os.makedirs(out_folder, exist_ok=True)
+    plot_frequency_response(freqs, smoothed, std_db=std, label=name, reference_db=ref_db,
+                            save_path=os.path.join(out_folder, "response.png"), show=False)
+    write_response_csv(os.path.join(out_folder, "response.csv"), freqs, smoothed, std)
+    write_spectra(os.path.join(out_folder, "spectra.npz"), spectra)
+    if normalized is not None:
+        plot_frequency_response(freqs, normalized, label=f"{name} - normalized",
+                                save_path=os.path.join(out_folder, "normalized.png"), show=False)
+        write_normalized_csv(os.path.join(out_folder, "normalized.csv"), freqs, normalized)
+
+    freqs_short, smoothed_short, std_short, _ = process_mic_recordings(
+        path, sweep_path="test_signals/sweep_short.wav", anomaly_threshold_db=job["anomaly_threshold_db"],
+        pattern="short_take_*.wav")
+    plot_frequency_response(freqs_short, smoothed_short, std_db=std_short, label=f"{name} (short)",
+                            save_path=os.path.join(out_folder, "response_short.png"), show=False)
+    write_response_csv(os.path.join(out_folder, "response_short.csv"), freqs_short, smoothed_short, std_short)
+
+    metadata = dict(job["metadata"], mic_name=name, timestamp=job["timestamp"], output_folder=out_folder,
+                    anomalous_takes=anomalies)
+    write_metadata(os.path.join(out_folder, "metadata.json"), metadata)
+    profiler.write(out_folder, extra={"mic_name": name, "action": "station_process"})
+    return {"name": name, "output_folder": out_folder, "anomalies": anomalies, "timestamp": job["timestamp"]}
+
+
+def run_station(input_device, output_device, input_mode="left", output_mode="left", repeats=3,
+                reference_db=None, ref_name=None, anomaly_threshold_db=6, workers=2, metadata=None, session=None,
+                min_phase=True):
+    """
+    Pipelined station loop. A capture thread records unit N while a process
+    pool processes and exports unit N-1, so cycle time is set by capture.
+    The operator swaps the DUT as soon as capture of the previous unit ends.
+    """
+    from exporter import append_run_history
+
+    capture_queue = queue.Queue()
+    capture_results = queue.Queue()  # (name, error or None) per capture request
+    in_flight = set()  # names captured or processing; their recordings folder is still in use
+    in_flight_lock = threading.Lock()
+    futures = []
+    results = []
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profiler.enabled,))
+    signals_info = load_manifest("test_signals")["signals"]
+    base_metadata = dict(metadata or {},
+                         reference_mic=ref_name,
+                         sweep_file="test_signals/sweep.wav",
+                         sweep_sha256=signals_info.get("sweep.wav", {}).get("sha256"),
+                         sample_rate=48000,
+                         num_sweeps=repeats,
+                         input_channel_mode=input_mode,
+                         output_channel_mode=output_mode,
+                         station_mode=True)
+
+    def on_done(name, future):
+        with in_flight_lock:
+            in_flight.discard(name)
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[!] Processing of {name} failed: {e}")
+            return
+        results.append(result)
+        append_run_history(result["timestamp"], result["name"], ref_name, result["output_folder"])
+        if result["anomalies"]:
+            print(f"[⚠] {result['name']}: anomalies in takes {result['anomalies']}")
+        print(f"[✓] {result['name']} processed -> {result['output_folder']}")
+
+    def capture_worker():
+        while True:
+            name = capture_queue.get()
+            if name is None:
+                break
+            path = os.path.join("recordings", name)
+            error = None
+            try:
+                profiler.reset()
+                with profiler.stage("capture_unit"):
+                    capture_unit(path, input_device, output_device, input_mode, output_mode, repeats, session)
+                profiler.write(path, extra={"mic_name": name, "action": "station_record"})
+                job = {
+                    "name": name,
+                    "path": path,
+                    "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+                    "reference_db": reference_db,
+                    "anomaly_threshold_db": anomaly_threshold_db,
+                    "min_phase": min_phase,
+                    "metadata": base_metadata,
+                }
+                future = pool.submit(process_unit, job)
+                future.add_done_callback(partial(on_done, name))
+                futures.append(future)
+            except Exception as e:
+                error = e
+            finally:
+                capture_results.put((name, error))
+
+    capture_thread = threading.Thread(target=capture_worker, daemon=True)
+    capture_thread.start()
+
+    print("[🏭] Station mode: results are processed in the background while the next DUT is captured.")
+    try:
+        while True:
+            name = input("Insert DUT and enter mic name (blank to finish): ").strip()
+            if not name:
+                break
+            with in_flight_lock:
+                busy = name in in_flight
+                in_flight.add(name)
+            if busy:
+                print(f"[!] {name} is still being processed, wait or use a different name.")
+                continue
+            capture_queue.put(name)
+            result = None
+            while result is None:
+                try:
+                    result = capture_results.get(timeout=0.5)
+                except queue.Empty:
+                    if not capture_thread.is_alive():
+                        break
+            if result is None:
+                print("[!] Capture worker stopped unexpectedly, ending station session.")
+                break
+            _, error = result
+            if error is not None:
+                with in_flight_lock:
+                    in_flight.discard(name)
+                print(f"[!] Capture of {name} failed: {error}")
+                print("[!] Check the DUT and devices, then re-enter the name to retry.")
+                continue
+            print(f"[✓] {name} captured, swap DUT now.")
+    finally:
+        capture_queue.put(None)
+        capture_thread.join()
+        print(f"[⏳] Waiting for {sum(not f.done() for f in futures)} unit(s) still processing...")
+        pool.shutdown(wait=True)
+
+    print(f"[✓] Station session finished: {len(results)} unit(s) processed.")
+    return results
@@ -20,19 +20,21 @@ def generate_log_sweep(filename="sweep.wav", duration=10.0, fs=48000, f_start=20
     print(f"[✓] Logarithmic sine sweep saved as {filename}")
 
 
-def generate_white_noise(filename="white_noise.wav", duration=10.0, fs=48000):
-    noise = np.random.normal(0, 0.5, int(duration * fs))
+def generate_white_noise(filename="white_noise.wav", duration=10.0, fs=48000, seed=None):
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 0.5, int(duration * fs))
     noise /= np.max(np.abs(noise))
     sf.write(filename, noise, fs)
     print(f"[✓] White noise saved as {filename}")
 
 
-def generate_pink_noise(filename="pink_noise.wav", duration=10.0, fs=48000):
+def generate_pink_noise(filename="pink_noise.wav", duration=10.0, fs=48000, seed=None):
     # Generate pink noise using Voss-McCartney algorithm approximation
     from scipy.signal import lfilter
     b = [0.049922035, -0.095993537, 0.050612699, -0.004408786]
     a = [1, -2.494956002, 2.017265875, -0.522189400]
-    white = np.random.randn(int(duration * fs))
+    rng = np.random.default_rng(seed)
+    white = rng.standard_normal(int(duration * fs))
     pink = lfilter(b, a, white)
     pink /= np.max(np.abs(pink))
     sf.write(filename, pink, fs)
@@ -44,8 +46,5 @@ def generate_silence(filename, duration=3.0, samplerate=48000):
   
 
 if __name__ == "__main__":
-    os.makedirs("test_signals", exist_ok=True)
-    generate_log_sweep("test_signals/sweep.wav")
-    generate_white_noise("test_signals/white_noise.wav")
-    generate_pink_noise("test_signals/pink_noise.wav")
-    generate_silence("test_signals/silence.wav")
+    from signal_manifest import ensure_test_signals
+    ensure_test_signals("test_signals")
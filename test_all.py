@@ -2,7 +2,7 @@
 # Script to test all core components of the mic measurement system
 
 import os
-from sweep_generator import generate_log_sweep, generate_white_noise, generate_pink_noise
+from signal_manifest import ensure_test_signals, record_take_excitation
 from recorder import record_mic_response
 from processor import process_mic_recordings
 from plotter import plot_frequency_response
@@ -13,10 +13,7 @@ import json
 
 def test_system(cleanup=True):
     print("[TEST] Generating test signals...")
-    os.makedirs("test_signals", exist_ok=True)
-    generate_log_sweep("test_signals/sweep.wav")
-    generate_white_noise("test_signals/white_noise.wav")
-    generate_pink_noise("test_signals/pink_noise.wav")
+    ensure_test_signals("test_signals")
 
     print("[TEST] Simulating reference mic recording...")
     ref_path = "recordings/test_ref"
@@ -24,12 +21,14 @@ def test_system(cleanup=True):
     # For testing, copy sweep.wav as fake recordings
     for i in range(1, 4):
         shutil.copy("test_signals/sweep.wav", os.path.join(ref_path, f"mic_take_{i}.wav"))
+        record_take_excitation(ref_path, f"mic_take_{i}.wav", "test_signals/sweep.wav")
 
     print("[TEST] Simulating DUT mic recording...")
     mic_path = "recordings/test_mic"
     os.makedirs(mic_path, exist_ok=True)
     for i in range(1, 4):
         shutil.copy("test_signals/sweep.wav", os.path.join(mic_path, f"mic_take_{i}.wav"))
+        record_take_excitation(mic_path, f"mic_take_{i}.wav", "test_signals/sweep.wav")
 
     print("[TEST] Processing mic and reference...")
     _, ref_db, _, _ = process_mic_recordings(ref_path)
@@ -68,6 +67,14 @@ def test_system(cleanup=True):
     with open(os.path.join(out_folder, "metadata.json"), "w") as f:
         json.dump(metadata, f, indent=2)
 
+    print("[TEST] Checking excitation hash mismatch is rejected...")
+    record_take_excitation(mic_path, "mic_take_1.wav", "test_signals/sweep_short.wav")
+    try:
+        process_mic_recordings(mic_path)
+        raise AssertionError("Mismatched excitation was not detected")
+    except ValueError as e:
+        print(f"[✓] Mismatch detected: {e}")
+
     print(f"[✓] All tests completed. Results saved to {out_folder}")
 
     if cleanup:
@@ -80,6 +87,388 @@ def test_system(cleanup=True):
             print(f"[!] Cleanup warning: {e}")
 
 
+def test_signal_manifest():
+    import tempfile
+    import soundfile as sf
+    import signal_manifest
+    from signal_manifest import SIGNAL_SPECS, signal_sha256
+
+    print("[TEST] Checking lazy test signal generation...")
+    folder = tempfile.mkdtemp()
+    generated = []
+    originals = dict(signal_manifest.GENERATORS)
+
+    def counting(generator):
+        def wrapper(path, **params):
+            generated.append(os.path.basename(path))
+            generator(path, **params)
+        return wrapper
+
+    for name, generator in originals.items():
+        signal_manifest.GENERATORS[name] = counting(generator)
+    try:
+        manifest = ensure_test_signals(folder)
+        assert sorted(generated) == sorted(SIGNAL_SPECS), f"Not all signals generated: {generated}"
+        assert os.path.exists(os.path.join(folder, "sweep_short.wav")), "sweep_short.wav missing"
+        assert "numpy_version" in manifest["signals"]["white_noise.wav"], "NumPy version not recorded"
+
+        generated.clear()
+        ensure_test_signals(folder)
+        assert generated == [], f"Up-to-date signals regenerated: {generated}"
+
+        # Same samples behind a different header must still count as up to date
+        path = os.path.join(folder, "sweep_short.wav")
+        data, fs = sf.read(path)
+        sha = signal_sha256(path)
+        sf.write(path, data, fs, subtype="FLOAT")
+        assert signal_sha256(path) == sha, "Sample hash depends on the file header"
+        ensure_test_signals(folder)
+        assert generated == [], "Header-only change triggered regeneration"
+
+        sf.write(os.path.join(folder, "white_noise.wav"), data[:1000], fs)
+        ensure_test_signals(folder)
+        assert generated == ["white_noise.wav"], f"Corrupted file not regenerated: {generated}"
+
+        generated.clear()
+        specs = dict(SIGNAL_SPECS)
+        generator, params = specs["pink_noise.wav"]
+        specs["pink_noise.wav"] = (generator, dict(params, seed=params["seed"] + 1))
+        ensure_test_signals(folder, specs=specs)
+        assert generated == ["pink_noise.wav"], f"Changed params not regenerated: {generated}"
+    finally:
+        signal_manifest.GENERATORS.update(originals)
+        shutil.rmtree(folder, ignore_errors=True)
+    print("[✓] Test signal manifest checks passed")
+
+
+def test_station_processing(cleanup=True):
+    import numpy as np
+    import soundfile as sf
+    from station import process_unit
+    from exporter import load_spectra
+
+    print("[TEST] Processing a simulated station unit...")
+    ensure_test_signals("test_signals")
+    path = "recordings/test_station"
+    os.makedirs(path, exist_ok=True)
+    for i in range(1, 4):
+        for prefix, sweep_path in (("mic_take_", "test_signals/sweep.wav"), ("short_take_", "test_signals/sweep_short.wav")):
+            shutil.copy(sweep_path, os.path.join(path, f"{prefix}{i}.wav"))
+            record_take_excitation(path, f"{prefix}{i}.wav", sweep_path)
+    _, reference_db, _, _ = process_mic_recordings(path)
+    # Take 3 is 14 dB low, far outside the 6 dB anomaly threshold
+    sweep, fs = sf.read("test_signals/sweep.wav")
+    sf.write(os.path.join(path, "mic_take_3.wav"), 0.2 * sweep, fs, subtype="FLOAT")  # no requantization
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result = process_unit({
+        "name": "test_station",
+        "path": path,
+        "timestamp": timestamp,
+        "reference_db": reference_db,
+        "anomaly_threshold_db": 6,
+        "min_phase": True,
+        "metadata": {"reference_mic": "test_station", "station_mode": True},
+    })
+    out_folder = result["output_folder"]
+    assert out_folder == os.path.join("output", f"test_station_{timestamp}"), f"Unexpected folder {out_folder}"
+    for filename in ("response.csv", "response.png", "normalized.csv", "normalized.png", "spectra.npz",
+                     "response_short.csv", "response_short.png", "metadata.json"):
+        assert os.path.exists(os.path.join(out_folder, filename)), f"{filename} missing"
+    with open(os.path.join(out_folder, "metadata.json")) as f:
+        metadata = json.load(f)
+    assert result["anomalies"] == [3] and metadata["anomalous_takes"] == [3], f"Anomalies {result['anomalies']}"
+    assert metadata["mic_name"] == "test_station" and metadata["station_mode"], "Job metadata not kept"
+    spectra = load_spectra(os.path.join(out_folder, "spectra.npz"))
+    assert int(spectra["n_fft"]) == 48000 and "min_phase_spectrum" in spectra, "FFT size not stored with spectra"
+    print("[✓] Station processing checks passed")
+
+    if cleanup:
+        shutil.rmtree(path, ignore_errors=True)
+        shutil.rmtree(out_folder, ignore_errors=True)
+
+
+def test_device_session():
+    import configparser
+    import device_interface
+    from device_interface import DeviceSession
+
+    print("[TEST] Checking device cache and name resolution with simulated devices...")
+
+    def device(name, hostapi, inputs=2, outputs=2):
+        return {"name": name, "hostapi": hostapi, "max_input_channels": inputs,
+                "max_output_channels": outputs, "default_samplerate": 48000.0}
+
+    devices = [device("Mic", 0), device("Spk", 0), device("Mic", 1), device("Spk", 1), device("Mono", 1, 1, 0)]
+    queries = []
+
+    def query_devices(index=None):
+        queries.append(index)
+        return list(devices) if index is None else devices[index]
+
+    sd = device_interface.sd
+    original = sd.query_devices
+    sd.query_devices = query_devices
+    try:
+        config = configparser.ConfigParser()
+        session = DeviceSession(config)
+        assert session.device_info(2)["hostapi"] == 1, "Wrong device info"
+        assert config.has_section("device:1:Mic") and len(config.sections()) == 1, f"Cache {config.sections()}"
+
+        # Cached entry confirmed by a single-device query, no enumeration
+        queries.clear()
+        session = DeviceSession(config)
+        assert session.resolve_device(2, "Mic", 1) == 2 and queries == [2], f"Queries {queries}"
+
+        # A device inserted ahead moves Mic (host API 1) from #2 to #3; #2 is now Spk on host API 0
+        devices.insert(0, device("Line", 0))
+        for hostapi in (1, None):  # saved host API, or the one cached for the old index
+            session = DeviceSession(config)
+            assert session.resolve_device(2, "Mic", hostapi) == 3, "Moved device not found on its host API"
+            config.remove_section("device:0:Spk")
+            config["device:1:Mic"] = {"index": "2", "max_input_channels": "2", "max_output_channels": "2"}
+        session = DeviceSession(config)
+        assert session.resolve_device(0, "Line", 0) == 0, "Unmoved device not kept"
+
+        # Gone, or only present on another host API
+        for name, hostapi in (("Gone", None), ("Line", 1)):
+            try:
+                DeviceSession(config).resolve_device(0, name, hostapi)
+                raise AssertionError(f"Missing device '{name}' was not reported")
+            except LookupError as e:
+                print(f"[✓] {e}")
+
+        session = DeviceSession(config)
+        for pair, reason in (((1, 4), "mixed host APIs"), ((5, 4), "mono input")):
+            try:
+                session.validate_pair(*pair)
+                raise AssertionError(f"validate_pair accepted {reason}")
+            except ValueError as e:
+                print(f"[✓] Rejected {reason}: {e}")
+        session.validate_pair(3, 4)
+    finally:
+        sd.query_devices = original
+    print("[✓] Device session checks passed")
+
+
+def test_instrumentation():
+    import tempfile
+    import time
+    import tracemalloc
+    from types import SimpleNamespace
+    from instrumentation import RunProfiler, aggregate_profiles
+
+    print("[TEST] Checking profiler stages, xrun counters and aggregation...")
+    was_tracing = tracemalloc.is_tracing()
+    folder = tempfile.mkdtemp()
+    try:
+        run = RunProfiler(enabled=True)
+        for delay in (0.01, 0.02):
+            with run.stage("work"):
+                time.sleep(delay)
+        run.count_stream_status(SimpleNamespace(input_overflow=True, output_underflow=False))
+        run.count_stream_status(None)  # empty status is not an event
+        data = run.to_dict()
+        assert data["stages"]["work"]["count"] == 2, "Stage count wrong"
+        assert data["stages"]["work"]["min_s"] >= 0.01 and data["stages"]["work"]["max_s"] >= 0.02, "Stage timing wrong"
+        assert data["counters"] == {"stream_status": 1, "input_overflow": 1, "xruns": 1}, f"Counters {data['counters']}"
+        first = run.write(os.path.join(folder, "run_1"))
+
+        run.reset()
+        with run.stage("work"):
+            time.sleep(0.01)
+        run.count_stream_status(SimpleNamespace(input_overflow=True))
+        second = run.write(os.path.join(folder, "run_2"))
+
+        profiles = []
+        for path in (first, second):
+            with open(path) as f:
+                profiles.append(json.load(f))
+        report = aggregate_profiles(patterns=(os.path.join(folder, "*", "profile.json"),))
+        work = report["stages"]["work"]
+        total = sum(p["stages"]["work"]["total_s"] for p in profiles)
+        assert report["runs"] == 2 and work["runs"] == 2 and work["count"] == 3, "Aggregate counts wrong"
+        assert abs(work["total_s"] - total) < 1e-9 and abs(work["mean_s"] - total / 3) < 1e-9, "Aggregate timing wrong"
+        assert report["counters"] == {"stream_status": 2, "input_overflow": 2, "xruns": 2}, "Aggregate counters wrong"
+        assert report["peak_memory_bytes"] == max(p["peak_memory_bytes"] for p in profiles), "Aggregate peak wrong"
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+        shutil.rmtree(folder, ignore_errors=True)
+    print("[✓] Instrumentation checks passed")
+
+
+def test_complex_response():
+    import numpy as np
+    from scipy.fft import rfft
+    from processor import compute_complex_response, minimum_phase_spectrum
+
+    print("[TEST] Checking group delay of a delayed impulse...")
+    fs = 48000
+    delay = 10
+    ir = np.zeros(fs)
+    ir[delay] = 1.0
+    response = compute_complex_response(ir, fs)
+    assert response["n_fft"] == fs and len(response["spectrum"]) == fs // 2 + 1, "Wrong FFT size"
+    assert np.allclose(response["group_delay"][1:-1], delay / fs), "Group delay of delayed impulse is wrong"
+
+    print("[TEST] Checking minimum-phase reconstruction of a minimum-phase FIR...")
+    n = 1024
+    fir = np.array([1.0, -0.5, 0.06])  # zeros at 0.2 and 0.3, inside the unit circle
+    expected = rfft(fir, n)
+    reconstructed = minimum_phase_spectrum(np.abs(expected), n)
+    assert np.allclose(reconstructed, expected, atol=1e-6), "Minimum-phase spectrum does not match FIR"
+    print("[✓] Complex response checks passed")
+
+
+def test_correction_design():
+    import tempfile
+    import numpy as np
+    from scipy.fft import rfftfreq
+    from scipy.signal import freqz
+    from correction import batch_design_corrections, correction_target_db
+
+    print("[TEST] Designing correction filters from a synthetic normalized.csv...")
+    fs = 48000
+    f_low, f_high, max_boost_db, max_cut_db = 200.0, 16000.0, 6.0, 12.0
+    freqs = rfftfreq(fs, 1 / fs)
+    normalized = 8 * np.sin(np.log2(np.maximum(freqs, 1)))  # +-8 dB ripple, exceeds the boost limit
+    root = tempfile.mkdtemp()
+    unit = os.path.join(root, "unit_20250101_000000")
+    os.makedirs(unit)
+    with open(os.path.join(unit, "normalized.csv"), "w") as f:
+        f.write("Frequency (Hz);Normalized Response (dB)\n")
+        for f_hz, db_val in zip(freqs, normalized):
+            f.write(f"{f_hz:.2f};{db_val:.2f}\n")
+
+    batch_design_corrections(output_root=root, fs=fs, f_low=f_low, f_high=f_high, max_boost_db=max_boost_db,
+                             max_cut_db=max_cut_db, numtaps=1023, num_biquads=8)
+    fir = np.loadtxt(os.path.join(unit, "correction_fir.csv"), skiprows=1)
+    with open(os.path.join(unit, "correction.json")) as f:
+        summary = json.load(f)
+    biquads = np.loadtxt(os.path.join(unit, "correction_biquads.csv"), delimiter=";", skiprows=1, ndmin=2)
+
+    grid, target = correction_target_db(freqs, np.round(normalized, 2), f_low, f_high, max_boost_db, max_cut_db)
+    assert target.max() <= max_boost_db + 1e-9 and target.min() >= -max_cut_db - 1e-9, "Target exceeds limits"
+    in_range = (grid >= f_low) & (grid <= f_high)
+    _, h = freqz(fir, worN=grid[in_range], fs=fs)
+    fir_db = 20 * np.log10(np.abs(h))
+    assert np.max(np.abs(fir_db - target[0, in_range])) < 1.0, "FIR response does not match target"
+    assert fir_db.max() < max_boost_db + 0.5, "FIR exceeds boost limit"
+    assert np.all(np.abs(biquads[:, 1]) <= max(max_boost_db, max_cut_db) + 1e-6), "Biquad gain exceeds limit"
+    assert summary["biquad_max_error_db"] < 2.0, "Biquad fit error too large"
+
+    out_grid, out_target = correction_target_db(freqs, normalized, 30000, 40000)  # range above the measured grid
+    assert out_target.shape == (1, len(out_grid)) and np.all(np.isfinite(out_target)), "Out-of-grid range failed"
+    for bad_low, bad_high in ((30000, 40000), (1000, 500), (0, 1000)):
+        try:
+            batch_design_corrections(output_root=root, fs=fs, f_low=bad_low, f_high=bad_high)
+            raise AssertionError(f"Correction range {bad_low}-{bad_high} Hz was accepted")
+        except ValueError as e:
+            print(f"[✓] Rejected: {e}")
+    shutil.rmtree(root)
+    print("[✓] Correction design checks passed")
+
+
+def test_matching():
+    import numpy as np
+    from matching import deviation_matrix, pair_units, group_units, match_inventory
+    from utils import log_frequency_grid
+
+    print("[TEST] Checking deviation matrix and unit matching...")
+    rng = np.random.default_rng(0)
+    grid = log_frequency_grid(20, 20000, 24)
+    responses = rng.normal(0, 1, (13, len(grid))) + rng.normal(0, 3, (13, 1))
+    bands = ((100.0, 1000.0), (1000.0, 10000.0))
+    masks = [(grid >= lo) & (grid <= hi) for lo, hi in bands]
+    aligned = [responses[:, m] - responses[:, m].mean(axis=1, keepdims=True) for m in masks]
+    diff = [r[:, None, :] - r[None, :, :] for r in aligned]
+    brute_max = np.max([np.max(np.abs(d), axis=-1) for d in diff], axis=0)
+    brute_rms = np.max([np.sqrt(np.mean(d ** 2, axis=-1)) for d in diff], axis=0)
+    dist_max = deviation_matrix(responses, grid, bands=bands, metric="max", block_size=4)
+    dist_rms = deviation_matrix(responses, grid, bands=bands, metric="rms")
+    assert np.allclose(dist_max, brute_max), "Blocked max deviation differs from brute force"
+    assert np.allclose(dist_rms, brute_rms, atol=1e-9), "Gram RMS deviation differs from direct computation"
+
+    # Three well-separated pairs plus one outlier
+    dist = np.full((7, 7), 10.0)
+    for i, j, d in ((0, 4, 0.5), (1, 5, 0.7), (2, 3, 0.3)):
+        dist[i, j] = dist[j, i] = d
+    np.fill_diagonal(dist, 0)
+    pairs, unmatched = pair_units(dist)
+    assert sorted(pairs) == [(0, 4), (1, 5), (2, 3)] and unmatched == [6], f"Unexpected pairs {pairs}"
+    pairs, unmatched = pair_units(dist, tolerance_db=0.6)
+    assert sorted(pairs) == [(0, 4), (2, 3)] and unmatched == [1, 5, 6], "Tolerance not applied to pairs"
+
+    # Two tight clusters of four and one leftover unit
+    labels = np.array([0, 1, 0, 1, 0, 1, 0, 1, 2])
+    dist = np.where(labels[:, None] == labels[None, :], 1.0, 8.0)
+    np.fill_diagonal(dist, 0)
+    groups, unmatched = group_units(dist, group_size=4)
+    assert sorted(sorted(g) for g in groups) == [[0, 2, 4, 6], [1, 3, 5, 7]] and unmatched == [8], \
+        f"Unexpected groups {groups}"
+    groups, unmatched = group_units(dist, group_size=4, tolerance_db=0.5)
+    assert groups == [] and len(unmatched) == 9, "Tolerance not applied to groups"
+    try:
+        match_inventory(group_size=1, save=False)
+        raise AssertionError("group_size=1 was accepted")
+    except ValueError as e:
+        print(f"[✓] Rejected: {e}")
+    print("[✓] Matching checks passed")
+
+
+def test_polar(cleanup=True):
+    import numpy as np
+    import soundfile as sf
+    from polar import angle_folder, load_polar_session, process_polar_tensor, directivity_index, beamwidth
+    from polar import process_polar_session, record_polar_session, SimulatedTurntable
+
+    print("[TEST] Simulating polar session...")
+    ensure_test_signals("test_signals")
+    session_path = "recordings/polar_test_polar"
+    angles = [0.0, 90.0, 180.0, 270.0]
+    for angle in angles:
+        path = angle_folder(session_path, angle)
+        os.makedirs(path, exist_ok=True)
+        for i in range(1, 3):
+            shutil.copy("test_signals/sweep.wav", os.path.join(path, f"mic_take_{i}.wav"))
+            record_take_excitation(path, f"mic_take_{i}.wav", "test_signals/sweep.wav")
+
+    # Every angle already has its takes, so resuming only writes polar.json
+    turntable = SimulatedTurntable()
+    record_polar_session("test_polar", angles, turntable, repeats=2)
+    with open(os.path.join(session_path, "polar.json")) as f:
+        info = json.load(f)
+    assert turntable.moves == [0.0] and info["angles"] == angles, "Recorded angles were not skipped on resume"
+
+    print("[TEST] Comparing batched polar processing with the per-take path...")
+    _, loaded_angles, tensor = load_polar_session(session_path)
+    assert tensor.shape[:2] == (4, 2) and tensor.dtype == np.float32, f"Unexpected tensor {tensor.shape} {tensor.dtype}"
+    sweep, _ = sf.read("test_signals/sweep.wav")
+    freqs, batch_db = process_polar_tensor(tensor, sweep, chunk_angles=3)
+    for a, angle in enumerate(loaded_angles):
+        _, expected, _, _ = process_mic_recordings(angle_folder(session_path, angle))
+        assert np.allclose(batch_db[a], expected, atol=1e-6), f"Batched response differs at {angle}°"
+
+    out_folder, _, relative, di, bw = process_polar_session(session_path, show=False)
+    assert np.allclose(relative, 0, atol=1e-6) and np.allclose(di, 0, atol=1e-6), "Identical angles must be omni"
+    assert np.all(bw == 360.0), "Omni beamwidth must be 360°"
+
+    print("[TEST] Checking directivity index and beamwidth of an analytic cardioid...")
+    cardioid_angles = np.arange(0.0, 360.0, 5.0)
+    with np.errstate(divide="ignore"):
+        cardioid_db = 20 * np.log10(0.5 + 0.5 * np.cos(np.radians(cardioid_angles)))[:, None]
+    di = directivity_index(cardioid_angles, cardioid_db)
+    bw = beamwidth(cardioid_angles, cardioid_db)
+    assert abs(di[0] - 10 * np.log10(3)) < 0.05, f"Cardioid DI {di[0]:.2f} dB, expected 4.77 dB"
+    assert abs(bw[0] - 180.0) < 0.5, f"Cardioid beamwidth {bw[0]:.1f}°, expected 180°"
+    print("[✓] Polar checks passed")
+
+    if cleanup:
+        shutil.rmtree(session_path, ignore_errors=True)
+        shutil.rmtree(out_folder, ignore_errors=True)
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -87,4 +476,12 @@ if __name__ == "__main__":
     parser.add_argument("--no-cleanup", action="store_true", help="Keep temporary test files")
     args = parser.parse_args()
 
+    test_signal_manifest()
     test_system(cleanup=not args.no_cleanup)
+    test_station_processing()
+    test_device_session()
+    test_instrumentation()
+    test_complex_response()
+    test_correction_design()
+    test_matching()
+    test_polar()
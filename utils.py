@@ -30,3 +30,24 @@ def linear_to_db(linear):
     """
     linear = np.maximum(linear, 1e-12)
     return 20 * np.log10(linear)
+
+
+def interp_rows(x_new, x, y):
+    """
+    Linearly interpolate every row of y (shape (..., len(x))) onto x_new in one
+    vectorized step. x must be increasing; values outside x are clamped.
+    """
+    x = np.asarray(x)
+    x_new = np.asarray(x_new)
+    idx = np.clip(np.searchsorted(x, x_new), 1, len(x) - 1)
+    x0, x1 = x[idx - 1], x[idx]
+    w = np.clip((x_new - x0) / np.where(x1 > x0, x1 - x0, 1), 0, 1)
+    return y[..., idx - 1] * (1 - w) + y[..., idx] * w
+
+
+def log_frequency_grid(f_low=20.0, f_high=20000.0, points_per_octave=24):
+    """
+    Log-spaced frequency grid with a fixed number of points per octave.
+    """
+    n = int(np.ceil(np.log2(f_high / f_low) * points_per_octave)) + 1
+    return np.geomspace(f_low, f_high, n)